@@ -0,0 +1,130 @@
+import hashlib
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+
+def is_current(source_path, dest_path, checksum=False):
+    try:
+        dest = os.stat(dest_path)
+    except FileNotFoundError:
+        return False
+    source = os.stat(source_path)
+    if (source.st_dev, source.st_ino) == (dest.st_dev, dest.st_ino):
+        return True
+    if source.st_size != dest.st_size:
+        return False
+    if checksum:
+        return file_hash(source_path) == file_hash(dest_path)
+    return source.st_mtime_ns == dest.st_mtime_ns
+
+
+def file_hash(path):
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").digest()
+
+
+@contextmanager
+def atomic_path(dest_path):
+    # a temp path beside dest_path, renamed over it when the block succeeds so readers never see a partial file;
+    # a block that removes the temp file leaves dest_path alone, and an error never leaves a temp file behind.
+    # Builds on other machines may share a directory, so the name is not made unique by the pid alone
+    os.makedirs(os.path.dirname(dest_path) or ".", exist_ok=True)
+    temp_path = f"{dest_path}.{os.getpid()}.{os.urandom(4).hex()}.tmp"
+    try:
+        yield temp_path
+        if os.path.lexists(temp_path):
+            os.replace(temp_path, dest_path)
+    finally:
+        if os.path.lexists(temp_path):
+            os.remove(temp_path)
+
+
+def sync_file(source_path, dest_path, link=False):
+    with atomic_path(dest_path) as temp_path:
+        if not (link and link_file(source_path, temp_path)):
+            shutil.copy2(source_path, temp_path)
+
+
+def link_file(source_path, dest_path):
+    try:
+        os.link(source_path, dest_path)
+        return True
+    except OSError:
+        pass
+    if not hasattr(os, "copy_file_range"):
+        return False
+    # across devices fall back to copy_file_range, which reflinks on filesystems that share extents
+    try:
+        with open(source_path, "rb") as source, open(dest_path, "wb") as dest:
+            remaining = os.fstat(source.fileno()).st_size
+            while remaining > 0:
+                copied = os.copy_file_range(source.fileno(), dest.fileno(), remaining)
+                if copied == 0:
+                    break
+                remaining -= copied
+        if remaining > 0:
+            raise OSError("short copy_file_range")
+        shutil.copystat(source_path, dest_path)
+        return True
+    except OSError:
+        if os.path.exists(dest_path):
+            os.remove(dest_path)
+        return False
+
+
+def write_if_changed(dest_path, data:bytes):
+    # identical output keeps its mtime, so deploy syncs and --compress only see pages that really changed
+    try:
+        if os.path.getsize(dest_path) == len(data) and file_hash(dest_path) == hashlib.sha256(data).digest():
+            return False
+    except FileNotFoundError:
+        pass
+    with atomic_path(dest_path) as temp_path:
+        with open(temp_path, "wb") as f:
+            f.write(data)
+    return True
+
+
+class HashingWriter:
+    # a text sink over a binary file that hashes and counts the bytes as they are written
+
+    def __init__(self, f):
+        self.f = f
+        self.digest = hashlib.sha256()
+        self.size = 0
+
+    def write(self, text:str):
+        data = text.encode()
+        self.digest.update(data)
+        self.size += len(data)
+        self.f.write(data)
+
+
+def write_stream_if_changed(dest_path, render):
+    # like write_if_changed for output that is never held whole: render streams it into a temp file next to
+    # dest_path, and the digest taken on the way decides whether the temp file replaces dest_path or is dropped
+    with atomic_path(dest_path) as temp_path:
+        with open(temp_path, "wb") as f:
+            writer = HashingWriter(f)
+            render(writer)
+        try:
+            changed = os.path.getsize(dest_path) != writer.size or file_hash(dest_path) != writer.digest.digest()
+        except FileNotFoundError:
+            changed = True
+        if not changed:
+            os.remove(temp_path)
+    return changed
+
+
+def sync_files(pairs:list[tuple[str, str]], link=False, checksum=False, workers=8):
+    def sync(pair):
+        source_path, dest_path = pair
+        if is_current(source_path, dest_path, checksum):
+            return False
+        sync_file(source_path, dest_path, link)
+        return True
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return [pair for pair, synced in zip(pairs, executor.map(sync, pairs)) if synced]
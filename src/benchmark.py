@@ -0,0 +1,187 @@
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from template import Template
+from textnode import block_to_block_type, markdown_to_blocks, markdown_to_html_node, text_to_textnodes
+
+WORDS = ("elf ring tower shire river road king sword ale song dragon stone hobbit wizard hill gate "
+         "fire shadow star tree forest mountain ship council").split()
+MAIN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+TEMPLATE = "<!DOCTYPE html>\n<html>\n<head><title> {{ Title }} </title></head>\n<body>\n{{ Content }}\n</body>\n</html>"
+
+
+def inline_text(rng, words, density):
+    parts = []
+    for _ in range(words):
+        word = rng.choice(WORDS)
+        if rng.random() < density:
+            match rng.randrange(5):
+                case 0:
+                    word = f"**{word} {rng.choice(WORDS)}**"
+                case 1:
+                    word = f"*{word}*"
+                case 2:
+                    word = f"`{word}()`"
+                case 3:
+                    word = f"[{word}](/{rng.choice(WORDS)})"
+                case 4:
+                    word = f"![{word}](/images/{rng.choice(WORDS)}.png)"
+        parts.append(word)
+    return " ".join(parts)
+
+
+def page_markdown(rng, title, blocks, density):
+    lines = [f"# {title}"]
+    for _ in range(blocks):
+        match rng.randrange(7):
+            case 0:
+                lines.append(f"## {inline_text(rng, 5, 0)}")
+            case 1:
+                lines.append("\n".join(f"* {inline_text(rng, 8, density)}" for _ in range(rng.randint(3, 30))))
+            case 2:
+                lines.append("\n".join(f"{i}. {inline_text(rng, 8, density)}" for i in range(1, rng.randint(3, 30))))
+            case 3:
+                lines.append("\n".join(f"> {inline_text(rng, 12, density)}" for _ in range(rng.randint(1, 4))))
+            case 4:
+                lines.append("```\n" + "\n".join(f"    {rng.choice(WORDS)}()" for _ in range(rng.randint(2, 10))) + "\n```")
+            case _:
+                lines.append(inline_text(rng, rng.randint(30, 120), density))
+    return "\n\n".join(lines) + "\n"
+
+
+def generate_corpus(root, pages=200, blocks=40, depth=2, density=0.2, seed=0):
+    rng = random.Random(seed)
+    paths = []
+    for i in range(pages):
+        sections = [f"section{rng.randrange(4)}" for _ in range(rng.randint(0, depth))]
+        path = os.path.join(root, *sections, f"page{i}.md")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(page_markdown(rng, f"Page {i}", blocks, density))
+        paths.append(path)
+    return paths
+
+
+def time_stage(function, repeat):
+    # the fastest run is the least disturbed by the rest of the machine
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run_benchmarks(root, pages, repeat=3, workers=1):
+    paths = sorted(os.path.join(directory, file) for directory, _, files in os.walk(os.path.join(root, "content"))
+                   for file in files)
+    sources = []
+    for path in paths:
+        with open(path, "r") as f:
+            sources.append(f.read())
+    paragraphs = [block for source in sources for block in markdown_to_blocks(source)
+                  if block_to_block_type(block) == "paragraph"]
+    trees = [markdown_to_html_node(source) for source in sources]
+    bodies = [tree.to_html() for tree in trees]
+    template = Template(TEMPLATE)
+    output = os.path.join(root, "io")
+    os.makedirs(output, exist_ok=True)
+
+    def inline():
+        for block in paragraphs:
+            text_to_textnodes(block)
+
+    def parse():
+        for source in sources:
+            markdown_to_html_node(source)
+
+    def serialize():
+        for tree in trees:
+            tree.to_html()
+
+    def render_template():
+        for body in bodies:
+            template.render_to_string({"Title": "Title", "Content": body})
+
+    def file_io():
+        for i, path in enumerate(paths):
+            with open(path, "r") as f:
+                text = f.read()
+            with open(os.path.join(output, f"{i}.html"), "w") as f:
+                f.write(text)
+
+    def build():
+        # a fresh interpreter per run, so the block memos an earlier repeat filled do not flatter the later ones
+        subprocess.run([sys.executable, MAIN_PATH, "--clean", "--no-cache", "--jobs", str(workers)], cwd=root,
+                       stdout=subprocess.DEVNULL, check=True)
+
+    stages = {
+        "text_to_textnodes": inline,
+        "markdown_to_html_node": parse,
+        "to_html": serialize,
+        "template": render_template,
+        "file_io": file_io,
+        "build": build,
+    }
+    results = {}
+    for name, function in stages.items():
+        seconds = time_stage(function, repeat)
+        results[name] = {"seconds": round(seconds, 6), "per_page_ms": round(seconds * 1000 / pages, 4)}
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Time each stage of the generator on a synthetic corpus")
+    parser.add_argument("--pages", type=int, default=200, help="number of generated pages")
+    parser.add_argument("--blocks", type=int, default=40, help="markdown blocks per page")
+    parser.add_argument("--depth", type=int, default=2, help="maximum directory nesting of pages")
+    parser.add_argument("--density", type=float, default=0.2, help="fraction of words carrying inline markup")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the corpus generator")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per stage, the fastest is reported")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="worker processes for the full build stage")
+    parser.add_argument("--output", help="write the JSON results to this file instead of stdout")
+    return parser.parse_args(argv)
+
+
+def run(argv=None):
+    args = parse_args(argv)
+    with tempfile.TemporaryDirectory() as root:
+        generate_corpus(os.path.join(root, "content"), args.pages, args.blocks, args.depth, args.density, args.seed)
+        os.makedirs(os.path.join(root, "static"))
+        with open(os.path.join(root, "template.html"), "w") as f:
+            f.write(TEMPLATE)
+        stages = run_benchmarks(root, args.pages, args.repeat, args.jobs)
+    report = {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "corpus": {"pages": args.pages, "blocks": args.blocks, "depth": args.depth, "density": args.density,
+                   "seed": args.seed},
+        "jobs": args.jobs,
+        "stages": stages,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    run()
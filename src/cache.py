@@ -0,0 +1,173 @@
+import codecs
+import hashlib
+import json
+import os
+import time
+import zlib
+from contextlib import contextmanager
+
+from assets import atomic_path
+from manifest import source_version
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+CACHE_DIR = os.path.join(".cache", "content")
+PARSER_SOURCES = ("cache.py", "htmlnode.py", "textnode.py")
+STALE_TEMP_SECONDS = 3600
+CHUNK_SIZE = 1 << 16
+
+
+class CorruptEntry(Exception):
+    pass
+
+
+class ContentCache:
+    # rendered content HTML plus a last line with its link and image targets, zlib-compressed, one file per key,
+    # evicted least recently used first; keys only depend on the markdown and the parser, so several builds and
+    # checkouts can share one directory
+
+    def __init__(self, directory:str = CACHE_DIR, max_bytes:int = 256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.version = source_version(PARSER_SOURCES).encode()
+
+    def key(self, source_path:str):
+        digest = hashlib.sha256(self.version)
+        with open(source_path, "rb") as f:
+            while chunk := f.read(1 << 20):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def path(self, key:str):
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key:str):
+        parts = []
+        try:
+            references = self.stream(key, parts.append)
+        except CorruptEntry:
+            return None
+        return None if references is None else ("".join(parts), references)
+
+    def stream(self, key:str, write):
+        # decompresses the entry a chunk at a time and hands write pieces that end just after a tag, so whatever
+        # write does per piece sees whole tags and the references line, which has no ">", is always in the held back
+        # tail; returns the references, or None without an entry. A damaged entry raises CorruptEntry, possibly after
+        # part of the content was already written
+        path = self.path(key)
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            return None
+        decompressor = zlib.decompressobj()
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        pending = ""
+        try:
+            with f:
+                while chunk := f.read(CHUNK_SIZE):
+                    while chunk:
+                        pending += decoder.decode(decompressor.decompress(chunk, CHUNK_SIZE))
+                        chunk = decompressor.unconsumed_tail
+                        cut = pending.rfind(">") + 1
+                        if cut:
+                            write(pending[:cut])
+                            pending = pending[cut:]
+                pending += decoder.decode(decompressor.flush(), final=True)
+            content, newline, references = pending.rpartition("\n")
+            if not decompressor.eof or not newline:
+                raise ValueError("truncated entry")
+            references = json.loads(references)
+        except (zlib.error, ValueError) as e:
+            raise CorruptEntry(path) from e
+        if content:
+            write(content)
+        # the mtime doubles as the last-use time for eviction
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return references
+
+    def put(self, key:str, content:str, references=()):
+        with self.writer(key, references) as write:
+            write(content)
+
+    @contextmanager
+    def writer(self, key:str, references):
+        # the entry is compressed as the content streams through; references may still fill up meanwhile,
+        # as they are stored last, and only a complete entry ever appears under the key
+        compressor = zlib.compressobj(6)
+        with atomic_path(self.path(key)) as temp_path:
+            with open(temp_path, "wb") as f:
+                yield lambda text: f.write(compressor.compress(text.encode()))
+                # ">" is escaped so stream can tell the references line from the content
+                trailer = json.dumps(list(references)).replace(">", "\\u003e")
+                f.write(compressor.compress(f"\n{trailer}".encode()))
+                f.write(compressor.flush())
+
+    def entries(self):
+        entries = []
+        if not os.path.isdir(self.directory):
+            return entries
+        with os.scandir(self.directory) as shards:
+            for shard in shards:
+                if not shard.is_dir():
+                    continue
+                with os.scandir(shard.path) as files:
+                    for entry in files:
+                        # another build sharing the directory may replace or remove the entry after the listing
+                        try:
+                            stat = entry.stat()
+                        except FileNotFoundError:
+                            continue
+                        if not entry.name.endswith(".tmp"):
+                            if entry.is_file():
+                                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+                        elif time.time() - stat.st_mtime > STALE_TEMP_SECONDS:
+                            # left behind by a writer that was killed
+                            remove_quietly(entry.path)
+        return entries
+
+    @contextmanager
+    def lock(self):
+        # one evicting build at a time; the others skip eviction instead of waiting
+        if fcntl is None:
+            yield True
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, ".lock"), "a") as f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def evict(self):
+        with self.lock() as locked:
+            if not locked:
+                return 0
+            entries = self.entries()
+            total = sum(size for _, size, _ in entries)
+            removed = 0
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                remove_quietly(path)
+                total -= size
+                removed += 1
+            return removed
+
+
+def remove_quietly(path):
+    # another build sharing the directory may have removed it first
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
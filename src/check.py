@@ -0,0 +1,66 @@
+import json
+import os
+from urllib.parse import unquote, urlsplit
+
+from assets import write_if_changed
+
+REFERENCES_PATH = os.path.join(".cache", "references.json")
+
+
+def is_internal(url:str):
+    parts = urlsplit(url)
+    return not (parts.scheme or parts.netloc) and parts.path != ""
+
+
+def target_candidates(url:str, dest_path:str, root="public"):
+    # the files a server would answer the url with, relative to the page that links to it
+    path = unquote(urlsplit(url).path)
+    if path.startswith("/"):
+        target = os.path.join(root, path.lstrip("/"))
+    else:
+        target = os.path.join(os.path.dirname(dest_path), path)
+    target = os.path.normpath(target)
+    if path.endswith("/"):
+        return [os.path.join(target, "index.html")]
+    return [target, os.path.join(target, "index.html"), target + ".html"]
+
+
+class ReferenceIndex:
+    # link and image targets of every page, kept between builds so unchanged pages need no parsing
+
+    def __init__(self, path:str = REFERENCES_PATH):
+        self.path = path
+        try:
+            with open(path, "r") as f:
+                self.pages = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.pages = {}
+
+    def __contains__(self, source:str):
+        return source in self.pages
+
+    def update(self, source:str, dest_path:str, references):
+        self.pages[source] = {"output": dest_path, "references": [list(reference) for reference in references]}
+
+    def targets(self, source:str):
+        page = self.pages.get(source)
+        if page is None:
+            return set()
+        return {path for _, kind, url in page["references"] if kind == "image" and is_internal(url)
+                for path in target_candidates(url, page["output"])[:1]}
+
+    def prune(self, sources):
+        for source in [source for source in self.pages if source not in sources]:
+            del self.pages[source]
+
+    def save(self):
+        write_if_changed(self.path, json.dumps(self.pages, separators=(",", ":"), sort_keys=True).encode())
+
+    def broken(self, outputs):
+        outputs = {os.path.normpath(output) for output in outputs}
+        broken = []
+        for source, page in sorted(self.pages.items()):
+            for line, kind, url in page["references"]:
+                if is_internal(url) and not any(path in outputs for path in target_candidates(url, page["output"])):
+                    broken.append((source, line, kind, url))
+        return broken
@@ -0,0 +1,80 @@
+import gzip
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from assets import atomic_path, write_if_changed
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+TEXT_EXTENSIONS = (".html", ".css", ".js", ".mjs", ".json", ".xml", ".svg", ".txt")
+MIN_SIZE = 1024
+COMPRESSED_PATH = os.path.join(".cache", "compressed.json")
+
+
+def encoders():
+    found = {".gz": lambda data: gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        found[".br"] = lambda data: brotli.compress(data, quality=11)
+    return found
+
+
+def compressible_files(root, min_size=MIN_SIZE):
+    files = []
+    stack = [root]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    stack.append(entry.path)
+                elif entry.is_file() and entry.name.endswith(TEXT_EXTENSIONS) and entry.stat().st_size >= min_size:
+                    files.append(entry.path)
+    return files
+
+
+def compress_file(path, extension, encode):
+    # the variant carries the source's mtime, so an unchanged source is never compressed twice
+    target = path + extension
+    source_mtime = os.stat(path).st_mtime_ns
+    try:
+        if os.stat(target).st_mtime_ns == source_mtime:
+            return False
+    except FileNotFoundError:
+        pass
+    with open(path, "rb") as f:
+        data = encode(f.read())
+    with atomic_path(target) as temp_path:
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.utime(temp_path, ns=(source_mtime, source_mtime))
+    return True
+
+
+def load_record(path):
+    try:
+        with open(path, "r") as f:
+            return set(json.load(f))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return set()
+
+
+def compress_tree(root, min_size=MIN_SIZE, workers=None, record_path=COMPRESSED_PATH):
+    # only variants recorded as written by an earlier run are ever replaced or removed, so a .gz that came
+    # from static/ is left alone; recorded variants whose source is gone or now too small are removed
+    previous = load_record(record_path)
+    tasks = [(path, extension, encode) for path in compressible_files(root, min_size)
+             for extension, encode in encoders().items()
+             if path + extension in previous or not os.path.exists(path + extension)]
+    variants = {path + extension for path, extension, _ in tasks}
+    removed = 0
+    for variant in previous - variants:
+        if os.path.exists(variant):
+            os.remove(variant)
+            removed += 1
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        written = sum(executor.map(lambda task: compress_file(*task), tasks))
+    write_if_changed(record_path, json.dumps(sorted(variants)).encode())
+    return written, len(tasks), removed
@@ -0,0 +1,43 @@
+class DependencyGraph:
+    # output -> the inputs it was built from; an output can itself be the input of another output
+
+    def __init__(self, edges:dict = None):
+        self.inputs = {output: set(inputs) for output, inputs in (edges or {}).items()}
+        self._outputs = None
+
+    def add(self, output:str, inputs):
+        self.inputs.setdefault(output, set()).update(inputs)
+        self._outputs = None
+
+    def outputs(self):
+        if self._outputs is None:
+            self._outputs = {}
+            for output, inputs in self.inputs.items():
+                for path in inputs:
+                    self._outputs.setdefault(path, set()).add(output)
+        return self._outputs
+
+    def dependents(self, paths):
+        # everything that has to be rebuilt, directly or through another output, when paths change
+        outputs = self.outputs()
+        found = set()
+        stack = list(paths)
+        while stack:
+            for output in outputs.get(stack.pop(), ()):
+                if output not in found:
+                    found.add(output)
+                    stack.append(output)
+        return found
+
+    def dependencies(self, paths):
+        found = set()
+        stack = list(paths)
+        while stack:
+            for path in self.inputs.get(stack.pop(), ()):
+                if path not in found:
+                    found.add(path)
+                    stack.append(path)
+        return found
+
+    def to_dict(self):
+        return {output: sorted(inputs) for output, inputs in sorted(self.inputs.items())}
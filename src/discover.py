@@ -0,0 +1,48 @@
+import os
+from fnmatch import fnmatch
+
+# dotfiles plus the swap, backup and lock files editors leave next to what they save
+IGNORED_NAMES = (".*", "*~", "#*#", "*.swp", "*.swo", "*.swx", "*.tmp", "4913")
+
+
+def is_ignored(path:str):
+    return any(fnmatch(os.path.basename(path), pattern) for pattern in IGNORED_NAMES)
+
+
+def matches(path:str, patterns):
+    return any(fnmatch(path, pattern) for pattern in patterns)
+
+
+def is_selected(relative:str, include=(), exclude=()):
+    # the same decision iter_files makes, for a single path: an excluded directory excludes everything below it
+    parts = relative.split("/")
+    if exclude and any(matches("/".join(parts[:depth]), exclude) for depth in range(1, len(parts) + 1)):
+        return False
+    return not include or matches(relative, include)
+
+
+def sorted_entries(path:str):
+    with os.scandir(path) as entries:
+        return sorted(entries, key=lambda entry: entry.name)
+
+
+def iter_files(root:str, include=(), exclude=()):
+    # depth first in name order like the old recursive listing, but with an explicit stack holding one
+    # directory listing per level; DirEntry type data comes from the listing itself, so no stat per entry
+    if not os.path.isdir(root):
+        return
+    stack = [iter(sorted_entries(root))]
+    while stack:
+        entry = next(stack[-1], None)
+        if entry is None:
+            stack.pop()
+            continue
+        if is_ignored(entry.name):
+            continue
+        relative = os.path.relpath(entry.path, root).replace(os.sep, "/")
+        if exclude and matches(relative, exclude):
+            continue
+        if entry.is_dir():
+            stack.append(iter(sorted_entries(entry.path)))
+        elif entry.is_file() and (not include or matches(relative, include)):
+            yield entry
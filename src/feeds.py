@@ -0,0 +1,111 @@
+import json
+import os
+import time
+from xml.sax.saxutils import escape, quoteattr
+
+from assets import write_if_changed
+
+FEEDS_PATH = os.path.join(".cache", "feeds.json")
+SITEMAP_LIMIT = 50000
+FEED_ENTRIES = 20
+
+
+def timestamp(mtime_ns:int):
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(mtime_ns // 1_000_000_000))
+
+
+class SiteIndex:
+    # every page with its title and the time its source last changed, kept between builds for sitemap and feed
+
+    def __init__(self, base_url:str, path:str = FEEDS_PATH, output:str = "public", shard_size:int = SITEMAP_LIMIT):
+        self.base_url = base_url.rstrip("/")
+        self.shard_size = shard_size
+        self.path = path
+        self.output = output
+        try:
+            with open(path, "r") as f:
+                state = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            state = {}
+        self.pages = state.get("pages", {})
+        self.shards = state.get("shards", 0)
+
+    def __contains__(self, source:str):
+        return source in self.pages
+
+    def update(self, source:str, url:str, title:str, fingerprint:dict):
+        # the source hash decides whether the page changed, so a touched but identical file keeps its date
+        page = self.pages.get(source)
+        if page is None or page["hash"] != fingerprint["hash"]:
+            updated = fingerprint["mtime"]
+        else:
+            updated = page["updated"]
+        self.pages[source] = {"url": url, "title": title if title is not None else page["title"],
+                              "hash": fingerprint["hash"], "updated": updated}
+
+    def prune(self, sources):
+        for source in [source for source in self.pages if source not in sources]:
+            del self.pages[source]
+
+    def save(self):
+        pages = sorted(self.pages.values(), key=lambda page: page["url"])
+        shards = [pages[i:i + self.shard_size] for i in range(0, len(pages), self.shard_size)]
+        written = 0
+        if len(shards) <= 1:
+            written += write_if_changed(os.path.join(self.output, "sitemap.xml"), self.urlset(pages))
+        else:
+            for number, shard in enumerate(shards, 1):
+                written += write_if_changed(os.path.join(self.output, f"sitemap-{number}.xml"), self.urlset(shard))
+            written += write_if_changed(os.path.join(self.output, "sitemap.xml"), self.sitemap_index(shards))
+        for number in range(len(shards) + 1 if len(shards) > 1 else 1, self.shards + 1):
+            path = os.path.join(self.output, f"sitemap-{number}.xml")
+            if os.path.exists(path):
+                os.remove(path)
+        self.shards = len(shards) if len(shards) > 1 else 0
+        written += write_if_changed(os.path.join(self.output, "feed.xml"), self.feed(pages))
+        write_if_changed(self.path, json.dumps({"pages": self.pages, "shards": self.shards},
+                                               separators=(",", ":"), sort_keys=True).encode())
+        return written
+
+    def outputs(self):
+        shards = [os.path.join(self.output, f"sitemap-{number}.xml") for number in range(1, self.shards + 1)]
+        return [os.path.join(self.output, "sitemap.xml"), os.path.join(self.output, "feed.xml")] + shards
+
+    def urlset(self, pages):
+        lines = ['<?xml version="1.0" encoding="UTF-8"?>',
+                 '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">']
+        for page in pages:
+            lines.append(f"<url><loc>{escape(self.base_url + page['url'])}</loc>"
+                         f"<lastmod>{timestamp(page['updated'])}</lastmod></url>")
+        lines.append("</urlset>")
+        return ("\n".join(lines) + "\n").encode()
+
+    def sitemap_index(self, shards):
+        lines = ['<?xml version="1.0" encoding="UTF-8"?>',
+                 '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">']
+        for number, shard in enumerate(shards, 1):
+            updated = max(page["updated"] for page in shard)
+            lines.append(f"<sitemap><loc>{escape(self.base_url)}/sitemap-{number}.xml</loc>"
+                         f"<lastmod>{timestamp(updated)}</lastmod></sitemap>")
+        lines.append("</sitemapindex>")
+        return ("\n".join(lines) + "\n").encode()
+
+    def feed(self, pages):
+        recent = sorted(pages, key=lambda page: (page["updated"], page["url"]), reverse=True)[:FEED_ENTRIES]
+        home = next((page for page in pages if page["url"] == "/"), None)
+        title = home["title"] if home is not None else self.base_url
+        updated = recent[0]["updated"] if recent else 0
+        lines = ['<?xml version="1.0" encoding="UTF-8"?>',
+                 '<feed xmlns="http://www.w3.org/2005/Atom">',
+                 f"<title>{escape(title)}</title>",
+                 f"<author><name>{escape(title)}</name></author>",
+                 f"<link href={quoteattr(self.base_url + '/')}/>",
+                 f"<link rel=\"self\" href={quoteattr(self.base_url + '/feed.xml')}/>",
+                 f"<id>{escape(self.base_url)}/</id>",
+                 f"<updated>{timestamp(updated)}</updated>"]
+        for page in recent:
+            url = self.base_url + page["url"]
+            lines.append(f"<entry><title>{escape(page['title'])}</title><link href={quoteattr(url)}/>"
+                         f"<id>{escape(url)}</id><updated>{timestamp(page['updated'])}</updated></entry>")
+        lines.append("</feed>")
+        return ("\n".join(lines) + "\n").encode()
@@ -1,10 +1,14 @@
-from functools import reduce
+import sys
+
+NO_CHILDREN = ()
 
 
 class HtmlNode:
+    __slots__ = ("tag", "value", "children", "props")
 
     def __init__(self, tag:str = None, value:str = None, children: list["HtmlNode"] = None, props:dict[str, str] = None):
-        self.tag = tag
+        # tags repeat on every node, so share one string object per tag name
+        self.tag = sys.intern(tag) if type(tag) is str else tag
         self.value = value
         self.children = children
         self.props = props
@@ -12,10 +16,18 @@ class HtmlNode:
     def to_html(self):
         raise NotImplementedError()
 
+    def iter_html(self):
+        yield self.to_html()
+
+    def write_html(self, sink):
+        write = sink.append if isinstance(sink, list) else sink.write
+        for chunk in self.iter_html():
+            write(chunk)
+
     def props_to_html(self):
         if not self.props:
             return ""
-        return reduce(lambda s, item: s + f" {item[0]}=\"{item[1]}\"",self.props.items(),"")
+        return "".join(f" {key}=\"{value}\"" for key, value in self.props.items())
 
     def __repr__(self):
         return f"HtmlNode(tag={self.tag}, value={self.value}, children={self.children}, props={self.props})"
@@ -23,9 +35,17 @@ class HtmlNode:
     def __eq__(self, other):
         if not isinstance(other, type(self)):
             return False
-        return self.tag == other.tag and self.value == other.value and self.children == other.children and self.props == other.props
+        return self.tag == other.tag and self.value == other.value and self.props == other.props and \
+            same_children(self.children, other.children)
+
+def same_children(children, other_children):
+    # the shared NO_CHILDREN tuple compares equal to an empty list
+    if children is None or other_children is None:
+        return children is other_children
+    return len(children) == len(other_children) and all(a == b for a, b in zip(children, other_children))
 
 class LeafNode(HtmlNode):
+    __slots__ = ()
 
     def __init__(self, value:str, tag:str = None, props:dict[str, str] = None):
         super().__init__(tag=tag, value=value, props=props)
@@ -41,16 +61,31 @@ class LeafNode(HtmlNode):
         return f"LeafNode(tag={self.tag}, value={self.value}, props={self.props})"
 
 class ParentNode(HtmlNode):
+    __slots__ = ()
 
     def __init__(self, tag:str, children: list["HtmlNode"], value:str = None, props:dict[str, str] = None):
         super().__init__(tag, value, children, props)
 
     def to_html(self):
-        if self.tag is None:
-            raise ValueError("tag cannot be None")
-        if self.children is None:
-            raise ValueError("children cannot be None")
-        return f"<{self.tag}{self.props_to_html()}>{reduce(lambda s, child: s + child.to_html(), self.children, "")}</{self.tag}>"
+        return "".join(self.iter_html())
+
+    def iter_html(self):
+        # explicit stack instead of recursion, so deep trees cannot hit the recursion limit
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, str):
+                yield node
+            elif isinstance(node, ParentNode):
+                if node.tag is None:
+                    raise ValueError("tag cannot be None")
+                if node.children is None:
+                    raise ValueError("children cannot be None")
+                yield f"<{node.tag}{node.props_to_html()}>"
+                stack.append(f"</{node.tag}>")
+                stack.extend(reversed(node.children))
+            else:
+                yield from node.iter_html()
 
     def __repr__(self):
         return f"ParentNode(tag={self.tag}, value={self.value}, children={self.children}, props={self.props})"
\ No newline at end of file
@@ -0,0 +1,169 @@
+import json
+import os
+import re
+import struct
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from assets import atomic_path, write_if_changed
+from check import is_internal, target_candidates
+from manifest import fingerprint
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+IMAGES_PATH = os.path.join(".cache", "images.json")
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif")
+VARIANT_WIDTHS = (480, 960)
+IMG_PATTERN = re.compile(r'<img src="([^"]*)"')
+SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def image_size(path):
+    # only the header is read; the pixel data is never decoded
+    with open(path, "rb") as f:
+        head = f.read(24)
+        if head[:8] == b"\x89PNG\r\n\x1a\n" and head[12:16] == b"IHDR":
+            return struct.unpack(">II", head[16:24])
+        if head[:6] in (b"GIF87a", b"GIF89a") and len(head) >= 10:
+            return struct.unpack("<HH", head[6:10])
+        if head[:2] == b"\xff\xd8":
+            f.seek(2)
+            return jpeg_size(f)
+    return None
+
+
+def jpeg_size(f):
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None
+        if marker[1] == 0xFF:
+            f.seek(-1, os.SEEK_CUR)
+            continue
+        if marker[1] == 0x01 or 0xD0 <= marker[1] <= 0xD9:
+            continue
+        length = f.read(2)
+        if len(length) < 2:
+            return None
+        if marker[1] in SOF_MARKERS:
+            segment = f.read(5)
+            if len(segment) < 5:
+                return None
+            height, width = struct.unpack(">xHH", segment)
+            return width, height
+        f.seek(struct.unpack(">H", length)[0] - 2, os.SEEK_CUR)
+
+
+def variant_path(path:str, width:int):
+    root, extension = os.path.splitext(path)
+    return f"{root}-{width}w{extension}"
+
+
+def load_images(path=IMAGES_PATH):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+class ImageIndex:
+    # intrinsic sizes keyed by content hash, and the downscaled variants written for each image in public/
+
+    def __init__(self, path:str = IMAGES_PATH, widths=VARIANT_WIDTHS):
+        self.path = path
+        self.widths = widths
+        self.previous = load_images(path)
+        self.files = {}
+        self.sizes = {}
+        self.outputs = {}
+        self.sources = {}
+
+    def add(self, source:str, dest:str):
+        old = self.previous.get("files", {}).get(source)
+        self.files[source] = fingerprint(source, old)
+        digest = self.files[source]["hash"]
+        size = self.previous.get("sizes", {}).get(digest) or image_size(source)
+        if size is None:
+            return
+        self.sizes[digest] = list(size)
+        widths = [width for width in self.widths if width < size[0]] if Image is not None else []
+        dest = os.path.normpath(dest)
+        self.outputs[dest] = [size[0], size[1], widths]
+        self.sources[dest] = source
+
+    def keep(self, source:str, dest:str):
+        # an image a partial rebuild did not touch keeps what the previous build recorded for it
+        old = self.previous.get("files", {}).get(source)
+        dest = os.path.normpath(dest)
+        output = self.previous.get("outputs", {}).get(dest)
+        if old is None or output is None:
+            return
+        self.files[source] = old
+        self.sizes[old["hash"]] = self.previous["sizes"][old["hash"]]
+        self.outputs[dest] = output
+        self.sources[dest] = source
+
+    def variants(self):
+        return [(self.sources[dest], dest, width) for dest, (_, _, widths) in self.outputs.items() for width in widths]
+
+    def write_variants(self, workers=None):
+        # an image Pillow cannot resize is reported and left without that variant, the build goes on
+        variants = self.variants()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            outcomes = list(executor.map(lambda variant: try_write_variant(*variant), variants))
+        written = 0
+        for (source, dest, width), (changed, error) in zip(variants, outcomes):
+            if error is not None:
+                print(f"Error resizing {source} to {width}w:\n{error}")
+                self.outputs[dest][2].remove(width)
+            written += changed
+        return written, len(variants)
+
+    def save(self):
+        data = {"files": self.files, "sizes": self.sizes, "outputs": self.outputs}
+        write_if_changed(self.path, json.dumps(data, separators=(",", ":"), sort_keys=True).encode())
+
+
+def write_variant(source:str, dest:str, width:int):
+    # like the compressed variants, a resized copy carries its source's mtime and is only redone when that moves
+    target = variant_path(dest, width)
+    source_mtime = os.stat(source).st_mtime_ns
+    try:
+        if os.stat(target).st_mtime_ns == source_mtime:
+            return False
+    except FileNotFoundError:
+        pass
+    with atomic_path(target) as temp_path:
+        with Image.open(source) as image:
+            height = max(1, round(image.height * width / image.width))
+            image.resize((width, height), Image.LANCZOS).save(temp_path, format=image.format)
+        os.utime(temp_path, ns=(source_mtime, source_mtime))
+    return True
+
+
+def try_write_variant(source:str, dest:str, width:int):
+    try:
+        return write_variant(source, dest, width), None
+    except Exception:
+        return False, traceback.format_exc()
+
+
+def add_image_attributes(content:str, dest_path:str, images:dict):
+    # sizes let the browser reserve space before the image arrives, srcset lets it pick a smaller variant
+    def attributes(match):
+        src = match[1]
+        image = images.get(target_candidates(src, dest_path)[0]) if is_internal(src) else None
+        if image is None:
+            return f'{match[0]} loading="lazy"'
+        width, height, widths = image
+        tag = f'{match[0]} width="{width}" height="{height}" loading="lazy"'
+        if widths:
+            srcset = ", ".join([f"{variant_path(src, variant)} {variant}w" for variant in widths] + [f"{src} {width}w"])
+            tag += f' srcset="{srcset}" sizes="(max-width: {width}px) 100vw, {width}px"'
+        return tag
+
+    return IMG_PATTERN.sub(attributes, content)
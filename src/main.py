@@ -1,25 +1,437 @@
+import argparse
 import os
 import shutil
+import traceback
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from functools import partial
+from itertools import chain, islice
+from multiprocessing import Manager
 
+from assets import sync_file, sync_files, write_stream_if_changed
+from cache import CACHE_DIR, ContentCache, CorruptEntry
+from check import ReferenceIndex
+from compress import MIN_SIZE, compress_tree
+from deps import DependencyGraph
+from discover import is_ignored, is_selected, iter_files
+from feeds import SiteIndex
+from images import IMAGE_EXTENSIONS, VARIANT_WIDTHS, ImageIndex, variant_path
+from manifest import Manifest, MANIFEST_PATH, load_manifest, save_manifest
+from page import PageContent, page_output
+from profiler import PageProfile, Profiler, page_stage
+from search import SearchIndex, page_url
+from server import serve
+from template import TEMPLATE_NAME, clear_template_cache, find_template, load_template
 from textnode import extract_title
-from textnode import markdown_to_html_node
+from textnode import SHARED_BLOCK_LIMIT, block_cache_stats, share_block_cache
 
+STREAM_CHUNKSIZE = 4
 
-def main():
-    clear_public()
-    generate_pages("content", "public")
 
-def generate_pages(source, destination):
-    for file in os.listdir(source):
-        if os.path.isfile(os.path.join(source, file)):
-            if file.endswith(".md"):
-                generate_page(
-                    os.path.join(source, file),
-                    "template.html",
-                    os.path.join(destination, file.replace(".md", ".html")),
-                )
-        if os.path.isdir(os.path.join(source, file)):
-            generate_pages(os.path.join(source, file), os.path.join(destination, file))
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == "deps":
+        report_dependencies(args.paths)
+        return
+    if args.command == "serve" and args.render:
+        on_change = (lambda paths: clear_template_cache()) if args.watch else None
+        serve("static", args.port, ["content", "static", TEMPLATE_NAME], on_change, content="content")
+        return
+    if args.command == "serve":
+        # the same indexes as a build, or the outputs they own would be removed as no longer built
+        build(incremental=True, workers=args.jobs, link=args.link, checksum=args.checksum,
+              search=SearchIndex() if args.search else None, references=ReferenceIndex(),
+              images=ImageIndex(widths=args.image_widths) if args.images else None,
+              site=SiteIndex(args.base_url) if args.base_url else None)
+        on_change = (lambda paths: rebuild_changed(paths, args.jobs, args.link, SearchIndex() if args.search else None,
+                                                   ReferenceIndex(),
+                                                   ImageIndex(widths=args.image_widths) if args.images else None)) \
+            if args.watch else None
+        serve("public", args.port, ["content", "static", TEMPLATE_NAME], on_change)
+        return
+    if args.clean:
+        clear_public()
+    profiler = Profiler(enabled=args.profile)
+    cache = ContentCache(args.cache_dir, args.cache_size * 1024 * 1024) if args.cache else None
+    search = SearchIndex() if args.search else None
+    references = ReferenceIndex()
+    images = ImageIndex(widths=args.image_widths) if args.images else None
+    site = SiteIndex(args.base_url) if args.base_url else None
+    stats = Counter()
+    failures = build(incremental=args.incremental, workers=args.jobs, link=args.link, checksum=args.checksum,
+                     profiler=profiler, cache=cache, stats=stats, share_blocks=args.share_blocks, search=search,
+                     references=references, images=images, site=site, include=args.include, exclude=args.exclude)
+    report_stats(stats)
+    broken = report_broken(references) if args.command == "check" else []
+    if args.compress:
+        with profiler.span("compress"):
+            written, total, removed = compress_tree("public", args.compress_min_size)
+        print(f"Compressed variants: {written} of {total} rewritten, {removed} orphan(s) removed")
+    if profiler.enabled:
+        profiler.report(args.profile_top)
+        profiler.write_trace(args.trace_file)
+        print(f"Wrote trace events to {args.trace_file}")
+    if failures:
+        print(f"{len(failures)} page(s) failed to generate")
+    if failures or broken:
+        raise SystemExit(1)
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Generate the site from content/ and static/ into public/")
+    parser.add_argument("command", nargs="?", choices=["build", "check", "deps", "serve"], default="build",
+                        help="build the site once (default), build it and report broken internal links and images, "
+                             "list what depends on the given paths as of the last build, or build it and serve public/")
+    parser.add_argument("paths", nargs="*", help="with deps, the inputs or outputs to look up")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only regenerate outputs whose inputs changed since the last build")
+    parser.add_argument("--clean", action="store_true", help="delete public/ before building")
+    parser.add_argument("--link", action="store_true",
+                        help="hardlink static files into public/ instead of copying them where possible")
+    parser.add_argument("--checksum", action="store_true",
+                        help="compare static files by content hash instead of size and mtime")
+    parser.add_argument("--include", action="append", default=[], metavar="GLOB",
+                        help="only build pages whose path below content/ matches; repeatable")
+    parser.add_argument("--exclude", action="append", default=[], metavar="GLOB",
+                        help="skip pages and directories whose path below content/ matches; repeatable")
+    parser.add_argument("--cache", action=argparse.BooleanOptionalAction, default=True,
+                        help="reuse rendered page content from .cache/ when the markdown has not changed")
+    parser.add_argument("--cache-dir", default=CACHE_DIR,
+                        help="content cache directory; can be shared by concurrent builds, e.g. a CI volume")
+    parser.add_argument("--cache-size", type=int, default=256, help="size limit of the content cache in MB")
+    parser.add_argument("--search", action=argparse.BooleanOptionalAction, default=True,
+                        help="write a sharded full-text search index to public/search/")
+    parser.add_argument("--base-url", help="absolute site URL; when given, sitemap.xml and feed.xml are written")
+    parser.add_argument("--images", action=argparse.BooleanOptionalAction, default=True,
+                        help="add sizes and lazy loading to images, plus srcset variants when Pillow is installed")
+    parser.add_argument("--image-widths", type=int, nargs="*", default=list(VARIANT_WIDTHS),
+                        help="widths in pixels of the downscaled image variants")
+    parser.add_argument("--share-blocks", action="store_true",
+                        help="share memoized block HTML between worker processes through a manager process")
+    parser.add_argument("--compress", action="store_true",
+                        help="write .gz (and .br when brotli is installed) variants of text files in public/")
+    parser.add_argument("--compress-min-size", type=int, default=MIN_SIZE,
+                        help="smallest file in bytes that --compress writes variants for")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                        help="number of worker processes used to generate pages")
+    parser.add_argument("--profile", action="store_true",
+                        help="time every page stage, print the slowest pages and write a Chrome trace")
+    parser.add_argument("--profile-top", type=int, default=10, help="number of slowest pages listed by --profile")
+    parser.add_argument("--trace-file", default=os.path.join(".cache", "trace.json"),
+                        help="where --profile writes its trace-event JSON")
+    parser.add_argument("--port", type=int, default=8888, help="port used by serve")
+    parser.add_argument("--watch", action="store_true",
+                        help="with serve, rebuild changed inputs and reload connected browsers")
+    parser.add_argument("--render", action="store_true",
+                        help="with serve, render pages from content/ on request instead of building public/")
+    return parser.parse_args(argv)
+
+def collect_pages(source, destination, include=(), exclude=()):
+    return list(iter_pages(source, destination, include, exclude))
+
+def iter_pages(source, destination, include=(), exclude=()):
+    for entry in iter_files(source, include, exclude):
+        if entry.name.endswith(".md"):
+            yield entry.path, page_output(os.path.relpath(entry.path, source), destination)
+
+def collect_files(source, destination, include=(), exclude=()):
+    return [(entry.path, os.path.join(destination, os.path.relpath(entry.path, source)))
+            for entry in iter_files(source, include, exclude)]
+
+
+def build(incremental=False, workers=1, link=False, checksum=False, profiler=None, cache=None, stats=None,
+          share_blocks=False, search=None, references=None, images=None,
+          site=None, include=(), exclude=(), manifest_path=MANIFEST_PATH, template_path=TEMPLATE_NAME,
+          content="content", static="static", public="public"):
+    profiler = profiler or Profiler(enabled=False)
+    # templates may have been added or edited since an earlier build in this process
+    clear_template_cache()
+    # the previous manifest is still loaded for full builds so outputs of deleted sources get removed
+    manifest = Manifest(load_manifest(manifest_path))
+    rebuild_all = not incremental or manifest.is_stale()
+    changed_templates = {}
+    with profiler.span("static"):
+        assets = collect_files(static, public)
+        synced = sync_files(assets, link=link, checksum=checksum)
+    for source_path, dest_path in assets:
+        manifest.add_output(source_path, dest_path)
+        manifest.depend(dest_path, [source_path])
+    print(f"Synced static files: {len(synced)} of {len(assets)} updated")
+    if stats is not None:
+        stats["files_changed"] += len(synced)
+        stats["files_unchanged"] += len(assets) - len(synced)
+    if images is not None:
+        with profiler.span("images"):
+            for source_path, dest_path in assets:
+                if source_path.lower().endswith(IMAGE_EXTENSIONS):
+                    images.add(source_path, dest_path)
+            written, total = images.write_variants()
+        for source_path, dest_path, width in images.variants():
+            manifest.add_output(f"{source_path}#{width}w", variant_path(dest_path, width))
+            manifest.depend(variant_path(dest_path, width), [dest_path])
+        images.save()
+        print(f"Image variants: {written} of {total} written")
+    # outputs reached through the graph from changed static files, directly or through an image;
+    # template and markdown changes are seen as the walk reaches each page
+    stale = manifest.previous_graph.dependents({source_path for source_path, _ in synced})
+    tracked = []
+    jobs = []
+
+    def page_jobs():
+        # consumed by generate_all while the walk is still running, so workers start on the first pages found
+        for source_path, dest_path in iter_pages(content, public, include, exclude):
+            page_template = find_template(source_path, content, template_path)
+            if page_template not in changed_templates:
+                changed_templates[page_template] = manifest.track(page_template)
+            changed = manifest.track(source_path, dest_path)
+            changed = manifest.track_template(source_path, page_template) or changed
+            tracked.append((source_path, page_template, dest_path))
+            if changed or rebuild_all or changed_templates[page_template] or dest_path in stale \
+                    or not os.path.exists(dest_path) \
+                    or (search is not None and source_path not in search) \
+                    or (references is not None and source_path not in references) \
+                    or (site is not None and source_path not in site):
+                jobs.append((source_path, page_template, dest_path))
+                yield jobs[-1]
+
+    image_sizes = images.outputs if images is not None else None
+    generate = partial(profile_page if profiler.enabled else generate_page, cache=cache, index=search is not None,
+                       references=references is not None, images=image_sizes)
+    with profiler.span("pages"):
+        results = []
+        failures = generate_all(page_jobs(), workers, generate, results, stats, share_blocks)
+    if profiler.enabled:
+        profiler.pages = results
+        results = [page.result for page in profiler.pages]
+    failed = set(failures)
+    generated = [job for job in jobs if job not in failed]
+    for (source_path, _, dest_path), (written, title, terms, links) in zip(generated, results):
+        if stats is not None:
+            stats["files_changed" if written else "files_unchanged"] += 1
+        if search is not None:
+            search.update(source_path, page_url(dest_path, public), title, terms)
+        if references is not None:
+            references.update(source_path, dest_path, links)
+    pages = {source_path for source_path, _, _ in tracked}
+    if include or exclude:
+        # pages the globs left out are not gone; their outputs and index entries stay as the last build left them
+        for source_path in manifest.previous.get("templates", {}):
+            relative = os.path.relpath(source_path, content).replace(os.sep, "/")
+            if source_path not in pages and os.path.isfile(source_path) and not is_selected(relative, include, exclude):
+                manifest.keep(source_path)
+                pages.add(source_path)
+    if search is not None:
+        search.prune(pages)
+        with profiler.span("search"):
+            shards = search.save()
+        print(f"Search index: {len(search.pages)} page(s), {shards} shard(s) updated")
+        for path in search.outputs():
+            manifest.add_output(path, path)
+    if references is not None:
+        references.prune(pages)
+        references.save()
+    if site is not None:
+        titles = {source_path: title for (source_path, _, _), (_, title, _, _) in zip(generated, results)}
+        for source_path, page_template, dest_path in tracked:
+            if (source_path, page_template, dest_path) not in failed and (source_path in titles or source_path in site):
+                site.update(source_path, page_url(dest_path, public), titles.get(source_path),
+                            manifest.inputs[source_path])
+        site.prune(pages)
+        print(f"Sitemap and feed: {site.save()} file(s) updated")
+        for path in site.outputs():
+            manifest.add_output(path, path)
+    for source_path, page_template, dest_path in tracked:
+        images_shown = references.targets(source_path) if references is not None else set()
+        manifest.depend(dest_path, {source_path, page_template} | images_shown)
+    if cache is not None:
+        cache.evict()
+    for source_path, _, _ in failures:
+        manifest.invalidate(source_path)
+    for dest_path in manifest.removed_outputs():
+        if os.path.exists(dest_path):
+            remove_output(dest_path, public)
+    save_manifest(manifest.to_dict(), manifest_path)
+    return failures
+
+def rebuild_changed(paths, workers=1, link=False, search=None, references=None, images=None,
+                    manifest_path=MANIFEST_PATH, template_path=TEMPLATE_NAME, content="content", static="static",
+                    public="public"):
+    # regenerates what the last build's dependency graph links to the changed inputs instead of re-checking the
+    # whole site; the manifest and indexes are updated for those inputs and carried over for the rest, so a later
+    # build starts from them
+    clear_template_cache()
+    manifest = Manifest(load_manifest(manifest_path))
+    sources = {output: source for source, output in manifest.previous.get("outputs", {}).items()}
+    touched = {os.path.normpath(path) for path in paths if not is_ignored(path)}
+    scopes = []
+    jobs = {}
+    for path in touched:
+        if is_within(path, static):
+            dest_path = os.path.join(public, os.path.relpath(path, static))
+            if os.path.isfile(path):
+                print(f"Copying {path} to {dest_path}")
+                sync_file(path, dest_path, link)
+                manifest.add_output(path, dest_path)
+                manifest.depend(dest_path, [path])
+                if images is not None and path.lower().endswith(IMAGE_EXTENSIONS):
+                    images.add(path, dest_path)
+        elif os.path.basename(path) == TEMPLATE_NAME:
+            if os.path.isfile(path):
+                manifest.track(path)
+            if is_within(path, content):
+                # pages below a template that appeared used the one above it, so they are found through that one
+                directory = os.path.dirname(path)
+                above = template_path if os.path.abspath(directory) == os.path.abspath(content) \
+                    else find_template(directory, content, template_path)
+                scopes.append((above, directory))
+        elif is_within(path, content) and path.endswith(".md") and os.path.isfile(path):
+            # a new page is not in the graph yet
+            dest_path = page_output(os.path.relpath(path, content), public)
+            jobs[path] = (path, find_template(path, content, template_path), dest_path)
+    if images is not None:
+        written, total = images.write_variants()
+        for source_path, dest_path, width in images.variants():
+            manifest.add_output(f"{source_path}#{width}w", variant_path(dest_path, width))
+            manifest.depend(variant_path(dest_path, width), [dest_path])
+        print(f"Image variants: {written} of {total} written")
+    stale = manifest.previous_graph.dependents(touched)
+    for above, directory in scopes:
+        stale.update(output for output in manifest.previous_graph.dependents([above])
+                     if output in sources and is_within(sources[output], directory))
+    for dest_path in stale:
+        source_path = sources.get(dest_path)
+        if source_path is not None and source_path.endswith(".md") and os.path.isfile(source_path):
+            jobs[source_path] = (source_path, find_template(source_path, content, template_path), dest_path)
+    touched.update(jobs)
+    # variants are keyed by their image's path and width
+    for source_path in manifest.previous.get("inputs", {}).keys() | manifest.previous.get("outputs", {}).keys():
+        if source_path.split("#")[0] not in touched:
+            manifest.keep(source_path)
+            if images is not None and source_path in manifest.outputs:
+                images.keep(source_path, manifest.outputs[source_path])
+    if images is not None:
+        images.save()
+    image_sizes = images.outputs if images is not None else None
+    results = []
+    failures = generate_all(list(jobs.values()), workers, partial(generate_page, index=search is not None,
+                                                                  references=references is not None,
+                                                                  images=image_sizes),
+                            results)
+    failed = set(failures)
+    generated = [job for job in jobs.values() if job not in failed]
+    for (source_path, page_template, dest_path), (_, title, terms, links) in zip(generated, results):
+        manifest.track(source_path, dest_path)
+        manifest.track_template(source_path, page_template)
+        if page_template not in manifest.inputs:
+            manifest.track(page_template)
+        if search is not None:
+            search.update(source_path, page_url(dest_path, public), title, terms)
+        if references is not None:
+            references.update(source_path, dest_path, links)
+        images_shown = references.targets(source_path) if references is not None else set()
+        manifest.depend(dest_path, {source_path, page_template} | images_shown)
+    for source_path, _, dest_path in failures:
+        manifest.add_output(source_path, dest_path)
+    removed = {path for path in touched if not os.path.exists(path)}
+    if search is not None:
+        search.prune(set(search.pages) - removed)
+        search.save()
+        for path in search.outputs():
+            manifest.add_output(path, path)
+    if references is not None:
+        references.prune(set(references.pages) - removed)
+        references.save()
+    for dest_path in manifest.removed_outputs():
+        if os.path.exists(dest_path):
+            remove_output(dest_path, public)
+    # a manifest from another generator version still makes the next build start over, so it is left as it is
+    if not manifest.is_stale():
+        save_manifest(manifest.to_dict(), manifest_path)
+    return failures
+
+def remove_output(dest_path, root="public"):
+    print(f"Removing {dest_path}")
+    os.remove(dest_path)
+    directory = os.path.dirname(dest_path)
+    while is_within(directory, root) and os.path.abspath(directory) != os.path.abspath(root) \
+            and not os.listdir(directory):
+        os.rmdir(directory)
+        directory = os.path.dirname(directory)
+
+def is_within(path, directory):
+    return os.path.commonpath([os.path.abspath(path), os.path.abspath(directory)]) == os.path.abspath(directory)
+
+def generate_all(jobs, workers=1, generate=None, results=None, stats=None, share_blocks=False):
+    # results come back in job order, so the log reads the same whatever the worker count;
+    # jobs may be a generator that is still walking the tree while the first pages are generated
+    run = partial(run_job, generate=generate or generate_page)
+    failures = []
+    chunksize = max(1, len(jobs) // (workers * 4)) if isinstance(jobs, list) else STREAM_CHUNKSIZE
+    jobs = iter(jobs)
+    first = list(islice(jobs, 2))
+    if workers > 1 and len(first) > 1:
+        with ExitStack() as stack:
+            initargs = (None,)
+            if share_blocks:
+                initargs = (stack.enter_context(Manager()).dict(), SHARED_BLOCK_LIMIT // workers)
+            executor = stack.enter_context(ProcessPoolExecutor(max_workers=workers, initializer=share_block_cache,
+                                                               initargs=initargs))
+            report_jobs(executor.map(run, chain(first, jobs), chunksize=chunksize), failures, results, stats)
+    else:
+        report_jobs(map(run, chain(first, jobs)), failures, results, stats)
+    return failures
+
+def report_jobs(outcomes, failures, results=None, stats=None):
+    for job, result, error, job_stats in outcomes:
+        from_path, template_path, dest_path = job
+        print(f"Generating page from {from_path} to {dest_path} using {template_path}")
+        if stats is not None:
+            stats.update(job_stats)
+        if error is not None:
+            print(f"Error generating {from_path}:\n{error}")
+            failures.append(job)
+        elif results is not None:
+            results.append(result)
+
+def run_job(job, generate):
+    # block cache counters are per process, so each job reports the change it caused
+    before = block_cache_stats()
+    try:
+        result, error = generate(*job), None
+    except Exception:
+        result, error = None, traceback.format_exc()
+    after = block_cache_stats()
+    after.subtract(before)
+    return job, result, error, after
+
+def report_dependencies(paths, manifest_path=MANIFEST_PATH):
+    graph = DependencyGraph(load_manifest(manifest_path).get("dependencies"))
+    for path in map(os.path.normpath, paths):
+        dependents = graph.dependents([path])
+        print(f"{path} is used by {len(dependents)} output(s)")
+        for output in sorted(dependents):
+            print(f"  {output}")
+        if path in graph.inputs:
+            dependencies = graph.dependencies([path])
+            print(f"{path} is built from {len(dependencies)} input(s)")
+            for source_path in sorted(dependencies):
+                print(f"  {source_path}")
+
+def report_broken(references, manifest_path=MANIFEST_PATH):
+    # targets resolve against the outputs the manifest just recorded, so public/ is never crawled
+    broken = references.broken(load_manifest(manifest_path).get("outputs", {}).values())
+    for source_path, line, kind, url in broken:
+        print(f"{source_path}:{line}: broken {kind} {url}")
+    print(f"Checked references: {len(broken)} broken")
+    return broken
+
+def report_stats(stats):
+    if stats["files_changed"] or stats["files_unchanged"]:
+        print(f"Output files: {stats['files_changed']} changed, {stats['files_unchanged']} unchanged")
+    lookups = stats["block_hits"] + stats["block_misses"]
+    if lookups:
+        print(f"Block cache: {stats['block_hits']} hits, {stats['block_misses']} misses "
+              f"({stats['block_hits'] * 100 / lookups:.0f}% reused)")
 
 
 def clear_public():
@@ -27,29 +439,36 @@ def clear_public():
     shutil.rmtree("public", ignore_errors=True)
     print(f"making public folder")
     os.mkdir("public")
-    print(f"copying files")
-    copy_tree("static", "public")
-
-def copy_tree(source, destination):
-    for item in os.listdir(source):
-        if os.path.isdir(os.path.join(source, item)):
-            os.mkdir(os.path.join(destination, item))
-            copy_tree(os.path.join(source, item), os.path.join(destination, item))
-        if os.path.isfile(os.path.join(source, item)):
-            print(f"Copying {os.path.join(source, item)} to {os.path.join(destination, item)}")
-            shutil.copy(os.path.join(source, item), destination)
-
-def generate_page(from_path, template_path, dest_path):
-    print(f"Generating page from {from_path} to {dest_path} using {template_path}")
-    with open(from_path, "r") as f:
-        from_text = f.read()
-    with open(template_path, "r") as f:
-        template_text = f.read()
-    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
-    with open(dest_path, "w") as f:
-        f.write(
-            template_text.replace("{{ Title }}", extract_title(from_text))
-            .replace("{{ Content }}", markdown_to_html_node(from_text).to_html())
-        )
-
-main()
+
+def generate_page(from_path, template_path, dest_path, cache=None, index=False, references=False, images=None,
+                  profile=None):
+    stage = page_stage(profile)
+    with stage("template"):
+        template = load_template(template_path)
+    with stage("read"):
+        with open(from_path, "r") as f:
+            title = extract_title(f)
+
+    def write(reuse):
+        content = PageContent(from_path, dest_path, cache, images, index, reuse, profile)
+        values = {"Title": title, "Content": content}
+        with stage("write"):
+            return content, write_stream_if_changed(dest_path, lambda sink: template.render(sink, values))
+
+    try:
+        content, written = write(True)
+    except CorruptEntry:
+        # a damaged entry only shows part way through the page, so the page is rendered again and the entry rewritten
+        content, written = write(False)
+    return written, title, content.terms, content.references if references else None
+
+def profile_page(from_path, template_path, dest_path, **kwargs):
+    # generate_page with its stages timed; the page's usual result is kept in the profile
+    profile = PageProfile(from_path)
+    profile.result = generate_page(from_path, template_path, dest_path, profile=profile, **kwargs)
+    profile.bytes_in = os.path.getsize(from_path)
+    profile.bytes_out = os.path.getsize(dest_path)
+    return profile.finish()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import hashlib
+import json
+import os
+
+from assets import atomic_path
+from deps import DependencyGraph
+
+SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+MANIFEST_PATH = os.path.join(".cache", "manifest.json")
+
+
+def generator_version():
+    return source_version([name for name in os.listdir(SOURCE_DIR) if name.endswith(".py") and not name.startswith("test_")])
+
+
+def source_version(names):
+    digest = hashlib.sha256()
+    for name in sorted(names):
+        digest.update(name.encode())
+        with open(os.path.join(SOURCE_DIR, name), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def fingerprint(path, previous=None):
+    # re-hashing is the expensive part, so trust the old hash while size and mtime are unchanged
+    stat = os.stat(path)
+    if previous and previous["size"] == stat.st_size and previous["mtime"] == stat.st_mtime_ns:
+        return previous
+    with open(path, "rb") as f:
+        digest = hashlib.file_digest(f, "sha256").hexdigest()
+    return {"hash": digest, "size": stat.st_size, "mtime": stat.st_mtime_ns}
+
+
+def load_manifest(path=MANIFEST_PATH):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    with atomic_path(path) as temp_path:
+        with open(temp_path, "w") as f:
+            json.dump(manifest, f)
+
+
+class Manifest:
+
+    def __init__(self, previous: dict = None):
+        self.previous = previous or {}
+        self.generator = generator_version()
+        self.inputs = {}
+        self.outputs = {}
+        self.templates = {}
+        self.graph = DependencyGraph()
+        self.previous_graph = DependencyGraph(self.previous.get("dependencies"))
+
+    def is_stale(self):
+        return self.previous.get("generator") != self.generator
+
+    def track(self, source:str, output:str = None):
+        old = self.previous.get("inputs", {}).get(source)
+        self.inputs[source] = fingerprint(source, old)
+        if output is not None:
+            self.outputs[source] = output
+        return old is None or old["hash"] != self.inputs[source]["hash"]
+
+    def add_output(self, source:str, output:str):
+        self.outputs[source] = output
+
+    def depend(self, output:str, inputs):
+        self.graph.add(output, inputs)
+
+    def track_template(self, source:str, template:str):
+        self.templates[source] = template
+        return self.previous.get("templates", {}).get(source) != template
+
+    def keep(self, source:str):
+        # a page left out of this build by --include/--exclude keeps what the previous build recorded for it
+        for key in ("inputs", "outputs", "templates"):
+            if source in self.previous.get(key, {}):
+                getattr(self, key)[source] = self.previous[key][source]
+        template = self.templates.get(source)
+        if template is not None and template not in self.inputs and template in self.previous.get("inputs", {}):
+            self.inputs[template] = self.previous["inputs"][template]
+        inputs = self.previous_graph.inputs.get(self.outputs.get(source))
+        if inputs:
+            self.graph.add(self.outputs[source], inputs)
+
+    def invalidate(self, source:str):
+        # keeping the output means a later build can still clean it up
+        self.inputs.pop(source, None)
+
+    def removed_outputs(self):
+        return [output for source, output in self.previous.get("outputs", {}).items() if source not in self.outputs]
+
+    def to_dict(self):
+        return {"generator": self.generator, "inputs": self.inputs, "outputs": self.outputs,
+                "templates": self.templates, "dependencies": self.graph.to_dict()}
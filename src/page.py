@@ -0,0 +1,66 @@
+import os
+
+from images import add_image_attributes
+from profiler import page_stage
+from search import add_terms
+from textnode import write_markdown_html
+
+
+def page_output(file, destination):
+    # only the file's own suffix changes; a directory such as notes.md.d keeps its name
+    return os.path.join(destination, os.path.splitext(file)[0] + ".html")
+
+
+class PageContent:
+    # the Content placeholder: content HTML goes into the page a block at a time, or a chunk at a time from a cache
+    # hit, filling the cache entry and picking up image attributes and search terms on the way, so the page is never
+    # held in memory as a whole
+
+    def __init__(self, from_path, dest_path, cache=None, images=None, index=False, reuse=True, profile=None):
+        self.from_path = from_path
+        self.dest_path = dest_path
+        self.cache = cache
+        self.reuse = reuse
+        self.images = images
+        self.terms = {} if index else None
+        self.position = 0
+        self.references = []
+        self.output = None
+        self.store = None
+        self.profile = profile
+        self.stage = page_stage(profile)
+
+    def __call__(self, sink):
+        self.output = sink.append if isinstance(sink, list) else sink.write
+        if self.cache is None:
+            return self.render(self)
+        with self.stage("cache"):
+            key = self.cache.key(self.from_path)
+            references = self.cache.stream(key, self.write) if self.reuse else None
+            if references is not None:
+                self.references = references
+                if self.profile is not None:
+                    self.profile.cached = True
+                return
+            with self.cache.writer(key, self.references) as store:
+                self.store = store
+                self.render(self)
+            self.store = None
+
+    def render(self, sink):
+        with self.stage("markdown"):
+            with open(self.from_path, "r") as source:
+                write_markdown_html(source, sink, self.references)
+
+    def write(self, text):
+        if self.store is not None:
+            with self.stage("cache"):
+                self.store(text)
+        if self.images is not None:
+            with self.stage("images"):
+                text = add_image_attributes(text, self.dest_path, self.images)
+        if self.terms is not None:
+            with self.stage("index"):
+                self.position = add_terms(self.terms, text, self.position)
+        with self.stage("write"):
+            self.output(text)
@@ -0,0 +1,111 @@
+import json
+import os
+import time
+from contextlib import contextmanager, nullcontext
+
+PAGE_STAGES = ("template", "read", "cache", "markdown", "images", "index", "write")
+
+
+class PageProfile:
+
+    def __init__(self, path:str):
+        self.path = path
+        self.pid = os.getpid()
+        self.start = time.perf_counter()
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.stages = {name: [0.0, 0.0, 0] for name in PAGE_STAGES}
+        self.active = []
+        self.marks = (self.start, time.process_time())
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.cached = False
+        self.result = None
+
+    @contextmanager
+    def stage(self, name:str):
+        # stages nest, as markdown calls back into images, index and write for every block, so each stage is
+        # charged only the time not spent in a stage inside it
+        self.charge()
+        self.active.append(name)
+        try:
+            yield
+        finally:
+            self.charge()
+            self.active.pop()
+            self.stages[name][2] += 1
+
+    def charge(self):
+        wall, cpu = time.perf_counter(), time.process_time()
+        if self.active:
+            totals = self.stages[self.active[-1]]
+            totals[0] += wall - self.marks[0]
+            totals[1] += cpu - self.marks[1]
+        self.marks = (wall, cpu)
+
+    def finish(self):
+        self.wall = time.perf_counter() - self.start
+        self.cpu = sum(cpu for _, cpu, _ in self.stages.values())
+        return self
+
+    def slowest_stage(self):
+        return max(self.stages, key=lambda name: self.stages[name][0])
+
+
+def page_stage(profile):
+    # the stage timer of profile, or one that times nothing when the page is not profiled
+    return profile.stage if profile is not None else lambda name: nullcontext()
+
+
+class Profiler:
+
+    def __init__(self, enabled:bool = True):
+        self.enabled = enabled
+        self.pages = []
+        self.spans = []
+
+    @contextmanager
+    def span(self, name:str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            if self.enabled:
+                self.spans.append((name, start, time.perf_counter() - start))
+
+    def report(self, top:int = 10):
+        print(f"Profiled {len(self.pages)} page(s)")
+        for name, _, duration in self.spans:
+            print(f"  {name:<16}{duration * 1000:>10.1f} ms")
+        print("Stage totals (wall ms / cpu ms):")
+        for stage in PAGE_STAGES:
+            wall = sum(page.stages[stage][0] for page in self.pages)
+            cpu = sum(page.stages[stage][1] for page in self.pages)
+            print(f"  {stage:<16}{wall * 1000:>10.1f}{cpu * 1000:>10.1f}")
+        print(f"Slowest {min(top, len(self.pages))} page(s):")
+        for page in sorted(self.pages, key=lambda page: page.wall, reverse=True)[:top]:
+            print(f"  {page.wall * 1000:>8.1f} ms  cpu {page.cpu * 1000:>8.1f} ms  in {page.bytes_in:>9} B  "
+                  f"out {page.bytes_out:>9} B  {'hit' if page.cached else 'miss':<4}  "
+                  f"slowest {page.slowest_stage():<8}  {page.path}")
+
+    def trace_events(self):
+        pid = os.getpid()
+        events = [{"name": name, "cat": "build", "ph": "X", "ts": start * 1e6, "dur": duration * 1e6,
+                   "pid": pid, "tid": pid} for name, start, duration in self.spans]
+        for page in self.pages:
+            events.append({"name": page.path, "cat": "page", "ph": "X", "ts": page.start * 1e6,
+                           "dur": page.wall * 1e6, "pid": pid, "tid": page.pid,
+                           "args": {"bytes_in": page.bytes_in, "bytes_out": page.bytes_out, "cached": page.cached}})
+            # stages alternate per block, so each stage is drawn as one span of its summed time
+            offset = page.start
+            for stage in PAGE_STAGES:
+                wall, cpu, calls = page.stages[stage]
+                events.append({"name": stage, "cat": "stage", "ph": "X", "ts": offset * 1e6, "dur": wall * 1e6,
+                               "pid": pid, "tid": page.pid, "args": {"cpu_ms": cpu * 1000, "calls": calls}})
+                offset += wall
+        return events
+
+    def write_trace(self, path:str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump({"traceEvents": self.trace_events(), "displayTimeUnit": "ms"}, f)
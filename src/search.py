@@ -0,0 +1,136 @@
+import html
+import json
+import os
+import re
+
+from assets import write_if_changed
+
+SEARCH_DIR = os.path.join(".cache", "search")
+OUTPUT_DIR = os.path.join("public", "search")
+PREFIX_LENGTH = 2
+TAG_PATTERN = re.compile(r"<[^>]*>")
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def page_terms(content:str):
+    # words of the content HTML the page was rendered from, each with its word positions
+    terms = {}
+    add_terms(terms, content)
+    return terms
+
+
+def add_terms(terms:dict, content:str, position:int = 0):
+    # content may come in chunks that end on tag boundaries; returns the position the next chunk starts at
+    words = WORD_PATTERN.findall(html.unescape(TAG_PATTERN.sub(" ", content)).lower())
+    for offset, word in enumerate(words):
+        if len(word) >= PREFIX_LENGTH:
+            terms.setdefault(word, []).append(position + offset)
+    return position + len(words)
+
+
+def shard_name(term:str):
+    # the browser derives the same name from a query word, so it only fetches the shards it needs
+    return re.sub(r"[^a-z0-9]", "_", term[:PREFIX_LENGTH])
+
+
+def page_url(dest_path, root="public"):
+    path = os.path.relpath(dest_path, root).replace(os.sep, "/")
+    if path == "index.html":
+        return "/"
+    if path.endswith("/index.html"):
+        return "/" + path[:-len("index.html")]
+    return "/" + path
+
+
+def load_json(path, default):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return default
+
+
+def dump_json(data):
+    return json.dumps(data, separators=(",", ":"), sort_keys=True).encode()
+
+
+class SearchIndex:
+    # an inverted index sharded by term prefix; shards are only rewritten when a page that uses them changed
+
+    def __init__(self, directory:str = SEARCH_DIR, output:str = OUTPUT_DIR):
+        self.directory = directory
+        self.output = output
+        state = load_json(os.path.join(directory, "index.json"), {})
+        self.pages = state.get("pages", {})
+        self.next_id = state.get("next_id", 0)
+        self.updates = {}
+        self.dirty = set()
+
+    def __contains__(self, source:str):
+        return source in self.pages
+
+    def update(self, source:str, url:str, title:str, terms:dict):
+        page = self.pages.get(source)
+        if page is None:
+            page_id = self.next_id
+            self.next_id += 1
+        else:
+            page_id = page["id"]
+            self.dirty.update(page["shards"])
+        shards = sorted({shard_name(term) for term in terms})
+        self.dirty.update(shards)
+        self.pages[source] = {"id": page_id, "url": url, "title": title, "shards": shards}
+        self.updates[page_id] = terms
+
+    def prune(self, sources):
+        for source in [source for source in self.pages if source not in sources]:
+            page = self.pages.pop(source)
+            self.dirty.update(page["shards"])
+            self.updates[page["id"]] = {}
+
+    def shard_paths(self, name:str):
+        return os.path.join(self.directory, "shards", f"{name}.json"), os.path.join(self.output, f"{name}.json")
+
+    def save(self):
+        postings = {}
+        for page_id, terms in self.updates.items():
+            for term, positions in terms.items():
+                postings.setdefault(shard_name(term), {}).setdefault(term, []).append([page_id, positions])
+        for name in self.dirty:
+            self.save_shard(name, postings.get(name, {}))
+        # after a clean build public/ has lost the shards that did not change, so restore them from the cache
+        for name in {name for page in self.pages.values() for name in page["shards"]} - self.dirty:
+            cached, public = self.shard_paths(name)
+            if not os.path.exists(public) and os.path.exists(cached):
+                with open(cached, "rb") as f:
+                    write_if_changed(public, f.read())
+        pages = {page["id"]: [page["url"], page["title"]] for page in self.pages.values()}
+        write_if_changed(os.path.join(self.output, "pages.json"), dump_json({"prefix": PREFIX_LENGTH, "pages": pages}))
+        write_if_changed(os.path.join(self.directory, "index.json"),
+                         dump_json({"pages": self.pages, "next_id": self.next_id}))
+        updated = len(self.dirty)
+        self.updates = {}
+        self.dirty = set()
+        return updated
+
+    def outputs(self):
+        names = {name for page in self.pages.values() for name in page["shards"]}
+        return [os.path.join(self.output, "pages.json")] + [self.shard_paths(name)[1] for name in sorted(names)]
+
+    def save_shard(self, name:str, additions:dict):
+        cached, public = self.shard_paths(name)
+        shard = {}
+        for term, entries in load_json(cached, {}).items():
+            entries = [entry for entry in entries if entry[0] not in self.updates]
+            if entries:
+                shard[term] = entries
+        for term, entries in additions.items():
+            shard[term] = sorted(shard.get(term, []) + entries)
+        if not shard:
+            for path in (cached, public):
+                if os.path.exists(path):
+                    os.remove(path)
+            return
+        data = dump_json(shard)
+        write_if_changed(cached, data)
+        write_if_changed(public, data)
@@ -0,0 +1,306 @@
+import hashlib
+import os
+import posixpath
+import threading
+import time
+from collections import OrderedDict
+from functools import partial
+from http import HTTPStatus
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+
+from discover import is_ignored
+from images import load_images
+from manifest import fingerprint
+from page import PageContent, page_output
+from template import TEMPLATE_NAME, find_template, load_template
+from textnode import extract_title
+
+RELOAD_PATH = "/__livereload"
+RELOAD_SCRIPT = f'<script>new EventSource("{RELOAD_PATH}").onmessage = () => location.reload();</script>'
+WATCH_INTERVAL = 0.05
+
+
+def snapshot(paths, listings=None):
+    # listings keeps each directory's entries from the previous poll under its mtime; a directory whose mtime has not
+    # moved has the same entries, so only its files are stat'ed again, which catches edits made in place
+    files = {}
+    stack = []
+    visited = set()
+    for path in paths:
+        if os.path.isdir(path):
+            stack.append(path)
+        elif os.path.isfile(path):
+            stat = os.stat(path)
+            files[path] = (stat.st_mtime_ns, stat.st_size)
+    while stack:
+        directory = stack.pop()
+        try:
+            mtime = os.stat(directory).st_mtime_ns
+        except FileNotFoundError:
+            continue
+        visited.add(directory)
+        listing = listings.get(directory) if listings is not None else None
+        if listing is None or listing[0] != mtime:
+            listing = (mtime, *list_directory(directory))
+            # an entry added within the same clock tick as the listing would not move the mtime again
+            if listings is not None and time.time_ns() - mtime > 10**9:
+                listings[directory] = listing
+        stack.extend(listing[2])
+        for path in listing[1]:
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            files[path] = (stat.st_mtime_ns, stat.st_size)
+    if listings is not None:
+        for directory in listings.keys() - visited:
+            del listings[directory]
+    return files
+
+
+def list_directory(directory):
+    files = []
+    subdirectories = []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            # editor swap and backup files would otherwise trigger a rebuild on every save
+            if is_ignored(entry.name):
+                continue
+            if entry.is_dir():
+                subdirectories.append(entry.path)
+            elif entry.is_file():
+                files.append(entry.path)
+    return files, subdirectories
+
+
+def changed_paths(old, new):
+    return sorted(path for path in old.keys() | new.keys() if old.get(path) != new.get(path))
+
+
+class Watcher(threading.Thread):
+
+    def __init__(self, paths:list[str], on_change, interval:float = WATCH_INTERVAL):
+        super().__init__(daemon=True)
+        self.paths = paths
+        self.on_change = on_change
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        listings = {}
+        files = snapshot(self.paths, listings)
+        while not self.stopped.wait(self.interval):
+            current = snapshot(self.paths, listings)
+            changes = changed_paths(files, current)
+            files = current
+            if changes:
+                try:
+                    self.on_change(changes)
+                except Exception as e:
+                    print(f"Rebuild failed: {e}")
+
+    def stop(self):
+        self.stopped.set()
+
+
+class ReloadNotifier:
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.version = 0
+
+    def notify(self):
+        with self.condition:
+            self.version += 1
+            self.condition.notify_all()
+
+    def wait(self, version:int, timeout:float):
+        with self.condition:
+            self.condition.wait_for(lambda: self.version != version, timeout)
+            return self.version
+
+
+class LiveReloadHandler(SimpleHTTPRequestHandler):
+
+    def __init__(self, *args, notifier:ReloadNotifier = None, **kwargs):
+        self.notifier = notifier
+        super().__init__(*args, **kwargs)
+
+    def do_GET(self):
+        if self.notifier is None:
+            return super().do_GET()
+        if self.path == RELOAD_PATH:
+            return self.send_events()
+        path = self.translate_path(self.path)
+        if os.path.isdir(path) and self.path.endswith("/"):
+            path = os.path.join(path, "index.html")
+        if not (path.endswith(".html") and os.path.isfile(path)):
+            return super().do_GET()
+        with open(path, "rb") as f:
+            body = f.read()
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Cache-Control", "no-store")
+        self.send_body(self.inject_reload(body))
+
+    def inject_reload(self, body:bytes):
+        if self.notifier is None:
+            return body
+        head, tag, tail = body.rpartition(b"</body>")
+        return head + RELOAD_SCRIPT.encode() + tag + tail if tag else body + RELOAD_SCRIPT.encode()
+
+    def send_body(self, body:bytes):
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def send_events(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        version = self.notifier.version
+        try:
+            while True:
+                current = self.notifier.wait(version, timeout=15)
+                # a comment line keeps idle connections open and detects closed tabs
+                self.wfile.write(b"data: reload\n\n" if current != version else b": ping\n\n")
+                self.wfile.flush()
+                version = current
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+class RenderCache:
+
+    def __init__(self, capacity:int = 1024):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.fingerprints = {}
+        self.lock = threading.Lock()
+
+    def get(self, key:str):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return self.entries[key]
+            return None
+
+    def put(self, key:str, body:bytes):
+        with self.lock:
+            self.entries[key] = body
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+
+    def fingerprint(self, path:str):
+        # only re-reads the source when its size or mtime moved
+        self.fingerprints[path] = fingerprint(path, self.fingerprints.get(path))
+        return self.fingerprints[path]["hash"]
+
+
+class RenderHandler(LiveReloadHandler):
+    protocol_version = "HTTP/1.1"
+
+    def __init__(self, *args, content:str, cache:RenderCache, template_path:str = TEMPLATE_NAME, images:dict = None,
+                 **kwargs):
+        self.content = content
+        self.cache = cache
+        self.template_path = template_path
+        self.images = images
+        super().__init__(*args, **kwargs)
+
+    def do_GET(self):
+        if self.path == RELOAD_PATH and self.notifier is not None:
+            return self.send_events()
+        source_path = self.source_for(self.path)
+        if source_path is None:
+            return SimpleHTTPRequestHandler.do_GET(self)
+        self.send_page(source_path)
+
+    def do_HEAD(self):
+        source_path = self.source_for(self.path)
+        if source_path is None:
+            return super().do_HEAD()
+        self.send_page(source_path)
+
+    def source_for(self, url_path:str):
+        path = posixpath.normpath(unquote(urlsplit(url_path).path)).lstrip("/")
+        if path in ("", "."):
+            candidates = ["index.md"]
+        elif path.endswith(".html"):
+            candidates = [path[:-len(".html")] + ".md"]
+        else:
+            candidates = [posixpath.join(path, "index.md"), path + ".md"]
+        for candidate in candidates:
+            source_path = os.path.join(self.content, *candidate.split("/"))
+            if os.path.isfile(source_path) and not candidate.startswith(".."):
+                return source_path
+        return None
+
+    def send_page(self, source_path:str):
+        template_path = find_template(source_path, self.content, self.template_path)
+        source_hash = self.cache.fingerprint(source_path)
+        key = hashlib.sha256(f"{source_hash}:{self.cache.fingerprint(template_path)}".encode()).hexdigest()
+        etag = f'"{key[:32]}"'
+        if etag in [tag.strip() for tag in self.headers.get("If-None-Match", "").split(",")]:
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        body = self.cache.get(key)
+        if body is None:
+            try:
+                dest_path = page_output(os.path.relpath(source_path, self.content), "public")
+                body = render_page(source_path, load_template(template_path), dest_path, self.images).encode()
+            except ValueError as e:
+                return self.send_error(HTTPStatus.INTERNAL_SERVER_ERROR, f"{source_path}: {e}")
+            self.cache.put(key, body)
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", "no-cache")
+        self.send_body(self.inject_reload(body))
+
+
+def render_page(source_path, template, dest_path, images=None):
+    # the same content path as a build, so pages look as they will once built
+    with open(source_path, "r") as f:
+        title = extract_title(f)
+    return template.render_to_string({"Title": title, "Content": PageContent(source_path, dest_path, images=images)})
+
+
+def render_images():
+    # sizes as the last build measured them; srcset is left out, as the variants only exist in public/
+    return {path: [width, height, []] for path, (width, height, _) in load_images().get("outputs", {}).items()}
+
+
+def serve(directory, port, watch_paths:list[str] = None, on_change = None, content:str = None):
+    notifier = ReloadNotifier() if on_change is not None else None
+    if content is not None:
+        handler = partial(RenderHandler, directory=directory, notifier=notifier, content=content, cache=RenderCache(),
+                          images=render_images())
+    else:
+        handler = partial(LiveReloadHandler, directory=directory, notifier=notifier)
+    server = ThreadingHTTPServer(("", port), handler)
+    server.daemon_threads = True
+    watcher = None
+    if notifier is not None:
+        def rebuild(paths):
+            start = time.perf_counter()
+            on_change(paths)
+            notifier.notify()
+            print(f"Rebuilt {len(paths)} changed path(s) in {(time.perf_counter() - start) * 1000:.0f} ms")
+        watcher = Watcher(watch_paths, rebuild)
+        watcher.start()
+    print(f"Serving {directory} on http://localhost:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if watcher is not None:
+            watcher.stop()
+        server.server_close()
@@ -0,0 +1,76 @@
+import os
+import re
+
+TEMPLATE_NAME = "template.html"
+PLACEHOLDER_PATTERN = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+
+_templates = {}
+_lookups = {}
+
+
+class Template:
+
+    def __init__(self, text:str):
+        # alternating (literal, None) and (placeholder source, name) segments
+        self.segments = []
+        position = 0
+        for match in PLACEHOLDER_PATTERN.finditer(text):
+            if match.start() > position:
+                self.segments.append((text[position:match.start()], None))
+            self.segments.append((match.group(0), match.group(1)))
+            position = match.end()
+        if position < len(text):
+            self.segments.append((text[position:], None))
+
+    def placeholders(self):
+        return [name for _, name in self.segments if name is not None]
+
+    def render(self, sink, values:dict):
+        write = sink.append if isinstance(sink, list) else sink.write
+        for text, name in self.segments:
+            if name is None or name not in values:
+                write(text)
+            elif callable(values[name]):
+                values[name](sink)
+            else:
+                write(values[name])
+
+    def render_to_string(self, values:dict):
+        parts = []
+        self.render(parts, values)
+        return "".join(parts)
+
+
+def load_template(path):
+    mtime = os.stat(path).st_mtime_ns
+    cached = _templates.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    with open(path, "r") as f:
+        template = Template(f.read())
+    _templates[path] = (mtime, template)
+    return template
+
+
+def find_template(source_path, content_root="content", default=TEMPLATE_NAME):
+    # the nearest template.html between the page's directory and content_root wins
+    directory = os.path.dirname(source_path)
+    if directory not in _lookups:
+        _lookups[directory] = lookup_template(directory, os.path.normpath(content_root), default)
+    return _lookups[directory]
+
+
+def lookup_template(directory, content_root, default):
+    directory = os.path.normpath(directory)
+    while True:
+        candidate = os.path.join(directory, TEMPLATE_NAME)
+        if os.path.isfile(candidate):
+            return candidate
+        if directory == content_root or directory in ("", ".", os.sep):
+            return default
+        directory = os.path.dirname(directory)
+
+
+def clear_template_cache():
+    _templates.clear()
+    _lookups.clear()
@@ -0,0 +1,89 @@
+import os
+import unittest
+
+from src.assets import atomic_path, is_current, sync_file, sync_files, write_if_changed, write_stream_if_changed
+from src.test_support import TempDirTestCase
+
+
+class TestAssets(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.source = os.path.join(self.dir.name, "static", "style.css")
+        self.dest = os.path.join(self.dir.name, "public", "css", "style.css")
+        os.makedirs(os.path.dirname(self.source))
+        self.write(self.source, "body {}")
+
+    def test_sync_file_copies(self):
+        sync_file(self.source, self.dest)
+        self.assertEqual(self.read(self.dest), "body {}")
+        self.assertTrue(is_current(self.source, self.dest))
+        self.assertListEqual(os.listdir(os.path.dirname(self.dest)), ["style.css"])
+
+    def test_sync_file_link(self):
+        sync_file(self.source, self.dest, link=True)
+        self.assertTrue(os.path.samefile(self.source, self.dest))
+        self.assertTrue(is_current(self.source, self.dest))
+
+    def test_is_current_detects_changes(self):
+        self.assertFalse(is_current(self.source, self.dest))
+        sync_file(self.source, self.dest)
+        self.write(self.source, "body { margin: 0 }")
+        self.assertFalse(is_current(self.source, self.dest))
+
+    def test_is_current_checksum_ignores_mtime(self):
+        sync_file(self.source, self.dest)
+        os.utime(self.dest, ns=(0, 0))
+        self.assertFalse(is_current(self.source, self.dest))
+        self.assertTrue(is_current(self.source, self.dest, checksum=True))
+
+    def test_sync_files_skips_unchanged(self):
+        other = os.path.join(self.dir.name, "static", "app.js")
+        self.write(other, "run()")
+        pairs = [(self.source, self.dest), (other, os.path.join(self.dir.name, "public", "app.js"))]
+        self.assertListEqual(sync_files(pairs, workers=2), pairs)
+        self.assertListEqual(sync_files(pairs, workers=2), [])
+
+    def test_write_if_changed_keeps_identical_files(self):
+        self.assertTrue(write_if_changed(self.dest, b"<p>hi</p>"))
+        os.utime(self.dest, ns=(0, 0))
+        self.assertFalse(write_if_changed(self.dest, b"<p>hi</p>"))
+        self.assertEqual(os.stat(self.dest).st_mtime_ns, 0)
+        self.assertTrue(write_if_changed(self.dest, b"<p>ho</p>"))
+        self.assertEqual(self.read(self.dest), "<p>ho</p>")
+        self.assertListEqual(os.listdir(os.path.dirname(self.dest)), ["style.css"])
+
+
+    def test_atomic_path_cleans_up_after_errors(self):
+        with self.assertRaises(OSError):
+            with atomic_path(self.dest) as temp_path:
+                self.write(temp_path, "partial")
+                raise OSError("disk full")
+        self.assertListEqual(os.listdir(os.path.dirname(self.dest)), [])
+        with atomic_path(self.dest) as temp_path:
+            self.write(temp_path, "done")
+        self.assertEqual(self.read(self.dest), "done")
+
+    def test_write_stream_if_changed_keeps_identical_files(self):
+        def render(text):
+            return lambda sink: [sink.write(part) for part in text.split(" ")]
+
+        self.assertTrue(write_stream_if_changed(self.dest, render("<p> hi </p>")))
+        os.utime(self.dest, ns=(0, 0))
+        self.assertFalse(write_stream_if_changed(self.dest, render("<p> hi </p>")))
+        self.assertEqual(os.stat(self.dest).st_mtime_ns, 0)
+        self.assertTrue(write_stream_if_changed(self.dest, render("<p> hé </p>")))
+        self.assertEqual(self.read(self.dest), "<p>hé</p>")
+        self.assertListEqual(os.listdir(os.path.dirname(self.dest)), ["style.css"])
+
+    def test_write_stream_if_changed_drops_temp_file_on_error(self):
+        def render(sink):
+            sink.write("<p>")
+            raise ValueError("broken page")
+
+        with self.assertRaises(ValueError):
+            write_stream_if_changed(self.dest, render)
+        self.assertListEqual(os.listdir(os.path.dirname(self.dest)), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
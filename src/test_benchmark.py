@@ -0,0 +1,32 @@
+import os
+import tempfile
+import unittest
+
+from src.benchmark import generate_corpus
+from textnode import extract_title, markdown_to_html_node
+
+
+class TestBenchmarkCorpus(unittest.TestCase):
+    def test_generate_corpus(self):
+        with tempfile.TemporaryDirectory() as root:
+            paths = generate_corpus(root, pages=20, blocks=15, depth=3, density=0.5, seed=1)
+            self.assertEqual(len(paths), 20)
+            for path in paths:
+                self.assertTrue(path.endswith(".md"))
+                with open(path, "r") as f:
+                    markdown = f.read()
+                self.assertEqual(extract_title(markdown), f"Page {paths.index(path)}")
+                self.assertTrue(markdown_to_html_node(markdown).to_html().startswith("<div><h1>"))
+
+    def test_generate_corpus_deterministic(self):
+        with tempfile.TemporaryDirectory() as first, tempfile.TemporaryDirectory() as second:
+            first_paths = generate_corpus(first, pages=5, seed=3)
+            second_paths = generate_corpus(second, pages=5, seed=3)
+            for a, b in zip(first_paths, second_paths):
+                self.assertEqual(os.path.relpath(a, first), os.path.relpath(b, second))
+                with open(a, "r") as f, open(b, "r") as g:
+                    self.assertEqual(f.read(), g.read())
+
+
+if __name__ == "__main__":
+    unittest.main()
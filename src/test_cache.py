@@ -0,0 +1,126 @@
+import contextlib
+import os
+import unittest
+import unittest.mock
+
+from src.cache import ContentCache, CorruptEntry
+from src.test_support import TempDirTestCase
+
+
+class TestContentCache(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cache = ContentCache(os.path.join(self.dir.name, "cache"))
+        self.source = os.path.join(self.dir.name, "index.md")
+        self.write(self.source, "# Home")
+
+    def test_miss_then_hit(self):
+        key = self.cache.key(self.source)
+        self.assertIsNone(self.cache.get(key))
+        self.cache.put(key, "<div><h1>Home</h1></div>", [(1, "link", "/")])
+        self.assertEqual(self.cache.get(key), ("<div><h1>Home</h1></div>", [[1, "link", "/"]]))
+
+    def test_writer_streams_entry(self):
+        key = self.cache.key(self.source)
+        references = []
+        with self.cache.writer(key, references) as write:
+            write("<div>")
+            references.append((1, "link", "/"))
+            write("</div>")
+        self.assertEqual(self.cache.get(key), ("<div></div>", [[1, "link", "/"]]))
+
+    def test_failed_writer_leaves_no_entry(self):
+        key = self.cache.key(self.source)
+        with self.assertRaises(ValueError):
+            with self.cache.writer(key, []) as write:
+                write("<div>")
+                raise ValueError("broken page")
+        self.assertIsNone(self.cache.get(key))
+        self.assertListEqual(os.listdir(os.path.dirname(self.cache.path(key))), [])
+
+    def test_key_follows_content(self):
+        key = self.cache.key(self.source)
+        self.assertEqual(self.cache.key(self.source), key)
+        self.write(self.source, "# Changed")
+        self.assertNotEqual(self.cache.key(self.source), key)
+
+    def test_corrupt_entry_is_a_miss(self):
+        key = self.cache.key(self.source)
+        self.cache.put(key, "content")
+        with open(self.cache.path(key), "wb") as f:
+            f.write(b"not zlib")
+        self.assertIsNone(self.cache.get(key))
+
+    def test_stream_writes_pieces_ending_after_tags(self):
+        key = self.cache.key(self.source)
+        content = "".join(f"<p>{os.urandom(64).hex()}</p>" for _ in range(2000))
+        self.cache.put(key, content, [(1, "link", "/a>b")])
+        pieces = []
+        self.assertEqual(self.cache.stream(key, pieces.append), [[1, "link", "/a>b"]])
+        self.assertGreater(len(pieces), 1)
+        self.assertTrue(all(piece.endswith(">") for piece in pieces))
+        self.assertEqual("".join(pieces), content)
+
+    def test_stream_truncated_entry_raises(self):
+        key = self.cache.key(self.source)
+        self.cache.put(key, "".join(f"<p>{os.urandom(64).hex()}</p>" for _ in range(2000)))
+        with open(self.cache.path(key), "rb") as f:
+            data = f.read()
+        with open(self.cache.path(key), "wb") as f:
+            f.write(data[:len(data) // 2])
+        with self.assertRaises(CorruptEntry):
+            self.cache.stream(key, lambda text: None)
+        self.assertIsNone(self.cache.get(key))
+
+    def test_evict_least_recently_used(self):
+        for i, key in enumerate(["aa1", "bb2", "cc3"]):
+            self.cache.put(key, os.urandom(600).hex())
+            os.utime(self.cache.path(key), ns=(i * 10**9, i * 10**9))
+        self.cache.get("aa1")
+        sizes = {path: size for _, size, path in self.cache.entries()}
+        self.cache.max_bytes = sizes[self.cache.path("aa1")] + sizes[self.cache.path("cc3")]
+        self.assertEqual(self.cache.evict(), 1)
+        self.assertIsNone(self.cache.get("bb2"))
+        self.assertIsNotNone(self.cache.get("aa1"))
+        self.assertIsNotNone(self.cache.get("cc3"))
+
+    def test_evict_skipped_while_another_build_holds_the_lock(self):
+        for key in ["aa1", "bb2"]:
+            self.cache.put(key, "content")
+        self.cache.max_bytes = 0
+        other = ContentCache(self.cache.directory, max_bytes=0)
+        with other.lock() as locked:
+            self.assertTrue(locked)
+            self.assertEqual(self.cache.evict(), 0)
+        self.assertEqual(self.cache.evict(), 2)
+
+    def test_entries_skip_files_removed_after_listing(self):
+        self.cache.put(self.cache.key(self.source), "content")
+        scandir = os.scandir
+
+        def listed_then_removed(path):
+            entries = list(scandir(path))
+            if path != self.cache.directory:
+                for entry in entries:
+                    os.remove(entry.path)
+            return contextlib.nullcontext(entries)
+
+        with unittest.mock.patch("os.scandir", listed_then_removed):
+            self.assertEqual(self.cache.entries(), [])
+
+    def test_removes_stale_temp_files(self):
+        key = self.cache.key(self.source)
+        self.cache.put(key, "content")
+        temp_path = self.cache.path(key) + ".123.abcd.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(b"partial")
+        self.cache.entries()
+        self.assertTrue(os.path.exists(temp_path))
+        os.utime(temp_path, (0, 0))
+        self.assertEqual(len(self.cache.entries()), 1)
+        self.assertFalse(os.path.exists(temp_path))
+        self.assertListEqual(os.listdir(os.path.dirname(temp_path)), [key])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,39 @@
+import os
+import unittest
+
+from src.check import ReferenceIndex, is_internal, target_candidates
+from src.test_support import TempDirTestCase
+
+
+class TestCheck(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.path = os.path.join(self.dir.name, "references.json")
+
+    def test_is_internal(self):
+        self.assertTrue(is_internal("/images/map.png"))
+        self.assertTrue(is_internal("../post?page=2"))
+        self.assertFalse(is_internal("https://example.com/"))
+        self.assertFalse(is_internal("mailto:frodo@shire.me"))
+        self.assertFalse(is_internal("#top"))
+
+    def test_target_candidates(self):
+        page = os.path.join("public", "blog", "index.html")
+        self.assertListEqual(target_candidates("/", page), [os.path.join("public", "index.html")])
+        self.assertIn(os.path.join("public", "blog", "map.png"), target_candidates("map.png", page))
+        self.assertIn(os.path.join("public", "majesty", "index.html"), target_candidates("/majesty#intro", page))
+
+    def test_broken(self):
+        index = ReferenceIndex(self.path)
+        index.update("content/index.md", "public/index.html",
+                     [(3, "link", "/majesty"), (5, "image", "/images/gone.png"), (7, "link", "https://a.b/")])
+        index.update("content/old.md", "public/old.html", [(1, "link", "/nowhere")])
+        index.prune({"content/index.md"})
+        index.save()
+        outputs = ["public/index.html", "public/majesty/index.html"]
+        self.assertListEqual(ReferenceIndex(self.path).broken(outputs),
+                             [("content/index.md", 5, "image", "/images/gone.png")])
+
+
+if __name__ == "__main__":
+    unittest.main()
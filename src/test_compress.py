@@ -0,0 +1,68 @@
+import gzip
+import os
+import unittest
+
+from src.compress import compress_tree
+from src.test_support import TempDirTestCase
+
+
+class TestCompress(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.page = os.path.join(self.dir.name, "blog", "index.html")
+        os.makedirs(os.path.dirname(self.page))
+        self.write(self.page, "<p>hello</p>" * 200)
+        self.write(os.path.join(self.dir.name, "small.css"), "body {}")
+        self.write(os.path.join(self.dir.name, "image.png"), "x" * 4096)
+        self.record = os.path.join(self.dir.name, "compressed.json")
+
+    def test_compresses_large_text_files(self):
+        written, total, removed = compress_tree(self.dir.name, min_size=1024, record_path=self.record)
+        self.assertEqual(written, total)
+        self.assertEqual(removed, 0)
+        with gzip.open(self.page + ".gz", "rt") as f:
+            self.assertEqual(f.read(), "<p>hello</p>" * 200)
+        self.assertFalse(os.path.exists(os.path.join(self.dir.name, "small.css.gz")))
+        self.assertFalse(os.path.exists(os.path.join(self.dir.name, "image.png.gz")))
+
+    def test_skips_unchanged_files(self):
+        compress_tree(self.dir.name, min_size=1024, record_path=self.record)
+        written, total, _ = compress_tree(self.dir.name, min_size=1024, record_path=self.record)
+        self.assertEqual(written, 0)
+        self.write(self.page, "<p>changed</p>" * 200)
+        os.utime(self.page, ns=(10**18, 10**18))
+        written, _, _ = compress_tree(self.dir.name, min_size=1024, record_path=self.record)
+        self.assertEqual(written, total)
+
+    def test_removes_orphans(self):
+        compress_tree(self.dir.name, min_size=1024, record_path=self.record)
+        os.remove(self.page)
+        _, total, removed = compress_tree(self.dir.name, min_size=1024, record_path=self.record)
+        self.assertEqual(total, 0)
+        self.assertGreaterEqual(removed, 1)
+        self.assertFalse(os.path.exists(self.page + ".gz"))
+
+    def test_removes_variants_of_files_that_shrank(self):
+        compress_tree(self.dir.name, min_size=1024, record_path=self.record)
+        self.write(self.page, "<p>")
+        _, total, removed = compress_tree(self.dir.name, min_size=1024, record_path=self.record)
+        self.assertEqual(total, 0)
+        self.assertGreaterEqual(removed, 1)
+        self.assertFalse(os.path.exists(self.page + ".gz"))
+
+    def test_keeps_compressed_files_it_did_not_write(self):
+        data = os.path.join(self.dir.name, "data.json.gz")
+        self.write(data, "not ours")
+        listed = os.path.join(self.dir.name, "listed.css")
+        self.write(listed, "a {}" * 500)
+        self.write(listed + ".gz", "shipped")
+        compress_tree(self.dir.name, min_size=1024, record_path=self.record)
+        compress_tree(self.dir.name, min_size=1024, record_path=self.record)
+        with open(data) as f:
+            self.assertEqual(f.read(), "not ours")
+        with open(listed + ".gz") as f:
+            self.assertEqual(f.read(), "shipped")
+
+
+if __name__ == "__main__":
+    unittest.main()
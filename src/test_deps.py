@@ -0,0 +1,32 @@
+import unittest
+
+from src.deps import DependencyGraph
+
+
+class TestDependencyGraph(unittest.TestCase):
+    def setUp(self):
+        self.graph = DependencyGraph()
+        self.graph.add("public/images/map.png", ["static/images/map.png"])
+        self.graph.add("public/images/map-480w.png", ["public/images/map.png"])
+        self.graph.add("public/index.html", ["content/index.md", "template.html", "public/images/map.png"])
+        self.graph.add("public/about.html", ["content/about.md", "template.html"])
+
+    def test_dependents_are_transitive(self):
+        self.assertSetEqual(self.graph.dependents(["static/images/map.png"]),
+                            {"public/images/map.png", "public/images/map-480w.png", "public/index.html"})
+        self.assertSetEqual(self.graph.dependents(["template.html"]), {"public/index.html", "public/about.html"})
+        self.assertSetEqual(self.graph.dependents(["content/missing.md"]), set())
+
+    def test_dependencies(self):
+        self.assertSetEqual(self.graph.dependencies(["public/images/map-480w.png"]),
+                            {"public/images/map.png", "static/images/map.png"})
+
+    def test_round_trip(self):
+        graph = DependencyGraph(self.graph.to_dict())
+        self.assertDictEqual(graph.to_dict(), self.graph.to_dict())
+        graph.add("public/about.html", ["static/images/map.png"])
+        self.assertIn("public/about.html", graph.dependents(["static/images/map.png"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+import os
+import unittest
+
+from src.discover import is_ignored, is_selected, iter_files
+from src.test_support import TempDirTestCase
+
+
+class TestDiscover(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        for path in ["index.md", "b/post.md", "b/.post.md.swp", "b/post.md~", ".git/config", "a/z/deep.md",
+                     "drafts/wip.md", "notes.txt", "#index.md#"]:
+            os.makedirs(os.path.join(self.dir.name, os.path.dirname(path)), exist_ok=True)
+            self.write(path, "")
+
+    def files(self, **kwargs):
+        return [os.path.relpath(entry.path, self.dir.name) for entry in iter_files(self.dir.name, **kwargs)]
+
+    def test_walks_in_name_order(self):
+        self.assertListEqual(self.files(), [os.path.join("a", "z", "deep.md"), os.path.join("b", "post.md"),
+                                            os.path.join("drafts", "wip.md"), "index.md", "notes.txt"])
+
+    def test_include_and_exclude(self):
+        self.assertListEqual(self.files(include=["*.md"], exclude=["drafts", "a/*"]),
+                             [os.path.join("b", "post.md"), "index.md"])
+
+    def test_is_selected(self):
+        self.assertTrue(is_selected("b/post.md", include=["*.md"], exclude=["drafts", "a/*"]))
+        self.assertFalse(is_selected("drafts/wip.md", include=["*.md"], exclude=["drafts", "a/*"]))
+        self.assertFalse(is_selected("a/z/deep.md", exclude=["a/*"]))
+        self.assertFalse(is_selected("notes.txt", include=["*.md"]))
+
+    def test_is_ignored(self):
+        self.assertTrue(is_ignored("content/.index.md.swp"))
+        self.assertTrue(is_ignored("content/index.md~"))
+        self.assertFalse(is_ignored("content/index.md"))
+
+    def test_missing_root(self):
+        self.assertListEqual(list(iter_files(os.path.join(self.dir.name, "missing"))), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import os
+import unittest
+
+from src.feeds import SiteIndex
+from src.test_support import TempDirTestCase
+
+
+class TestSiteIndex(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.state = os.path.join(self.dir.name, "feeds.json")
+        self.public = os.path.join(self.dir.name, "public")
+
+    def index(self, shard_size=50000):
+        return SiteIndex("https://example.org/", self.state, self.public, shard_size)
+
+    def test_sitemap_and_feed(self):
+        site = self.index()
+        site.update("content/index.md", "/", "Home & Co", {"hash": "a", "mtime": 0})
+        site.update("content/post.md", "/post.html", "Post", {"hash": "b", "mtime": 86400 * 10**9})
+        self.assertEqual(site.save(), 2)
+        sitemap = self.read("public/sitemap.xml")
+        self.assertIn("<url><loc>https://example.org/post.html</loc><lastmod>1970-01-02T00:00:00Z</lastmod></url>",
+                      sitemap)
+        feed = self.read("public/feed.xml")
+        self.assertIn("<title>Home &amp; Co</title>", feed)
+        self.assertLess(feed.index("/post.html"), feed.index("<id>https://example.org/</id><updated>1970-01-01"))
+
+    def test_unchanged_hash_keeps_date(self):
+        site = self.index()
+        site.update("content/index.md", "/", "Home", {"hash": "a", "mtime": 0})
+        site.save()
+        site = self.index()
+        self.assertIn("content/index.md", site)
+        site.update("content/index.md", "/", None, {"hash": "a", "mtime": 10**12})
+        self.assertEqual(site.save(), 0)
+        site.update("content/index.md", "/", None, {"hash": "b", "mtime": 10**12})
+        self.assertEqual(site.pages["content/index.md"], {"url": "/", "title": "Home", "hash": "b", "updated": 10**12})
+
+    def test_sharded_sitemap(self):
+        site = self.index(shard_size=2)
+        for i in range(5):
+            site.update(f"content/{i}.md", f"/{i}.html", str(i), {"hash": str(i), "mtime": 0})
+        site.save()
+        self.assertEqual(self.read("public/sitemap.xml").count("<sitemap>"), 3)
+        self.assertIn("/4.html", self.read("public/sitemap-3.xml"))
+        self.assertEqual(len(site.outputs()), 5)
+        site.prune({"content/0.md"})
+        site.save()
+        self.assertNotIn("<sitemap>", self.read("public/sitemap.xml"))
+        self.assertFalse(os.path.exists(os.path.join(self.public, "sitemap-1.xml")))
+        self.assertEqual(site.outputs(), [os.path.join(self.public, "sitemap.xml"), os.path.join(self.public, "feed.xml")])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,7 @@
+import io
 import unittest
 
-from src.htmlnode import HtmlNode, LeafNode, ParentNode
+from src.htmlnode import NO_CHILDREN, HtmlNode, LeafNode, ParentNode
 from textnode import TextNode, TextType
 
 
@@ -72,4 +73,28 @@ class TestParentNode(unittest.TestCase):
     def test_to_html_tag_prop_one_parent_one_leaf(self):
         node = ParentNode("p",[ParentNode("d",[LeafNode("test")])], props={"class": "bold"})
         self.assertEqual(node.to_html(), "<p class=\"bold\"><d>test</d></p>")
-
+    def test_write_html_list(self):
+        node = ParentNode("p",[LeafNode("test","b"),LeafNode("tset")])
+        parts = []
+        node.write_html(parts)
+        self.assertEqual("".join(parts), "<p><b>test</b>tset</p>")
+    def test_write_html_stream(self):
+        node = ParentNode("p",[ParentNode("d",[LeafNode("test")])], props={"class": "bold"})
+        sink = io.StringIO()
+        node.write_html(sink)
+        self.assertEqual(sink.getvalue(), node.to_html())
+    def test_to_html_deep_tree(self):
+        node = LeafNode("test")
+        for _ in range(10000):
+            node = ParentNode("d",[node])
+        self.assertEqual(node.to_html(), "<d>" * 10000 + "test" + "</d>" * 10000)
+    def test_to_html_nested_child_none(self):
+        node = ParentNode("p",[ParentNode("d",None)])
+        self.assertRaises(ValueError,lambda:node.to_html())
+    def test_no_children_equals_empty_list(self):
+        self.assertEqual(ParentNode("img",NO_CHILDREN), ParentNode("img",[]))
+        self.assertNotEqual(ParentNode("img",NO_CHILDREN), ParentNode("img",None))
+    def test_slots(self):
+        node = ParentNode("p",[LeafNode("test","b")])
+        self.assertFalse(hasattr(node, "__dict__"))
+        self.assertFalse(hasattr(node.children[0], "__dict__"))
@@ -0,0 +1,61 @@
+import os
+import struct
+import unittest
+import unittest.mock
+
+from src.images import ImageIndex, add_image_attributes, image_size, variant_path
+from src.test_support import TempDirTestCase
+
+
+class TestImages(TempDirTestCase):
+    def test_png_size(self):
+        header = b"\x89PNG\r\n\x1a\n" + struct.pack(">I", 13) + b"IHDR" + struct.pack(">II", 1344, 896)
+        self.assertEqual(image_size(self.write("a.png", header + b"\x00" * 16)), (1344, 896))
+
+    def test_gif_size(self):
+        self.assertEqual(image_size(self.write("a.gif", b"GIF89a" + struct.pack("<HH", 40, 30) + b"\x00" * 8)),
+                         (40, 30))
+
+    def test_jpeg_size(self):
+        app0 = b"\xff\xe0" + struct.pack(">H", 16) + b"JFIF\x00" + b"\x00" * 9
+        sof = b"\xff\xc0" + struct.pack(">HBHH", 17, 8, 600, 800) + b"\x00" * 10
+        self.assertEqual(image_size(self.write("a.jpg", b"\xff\xd8" + app0 + sof)), (800, 600))
+
+    def test_unknown_format(self):
+        self.assertIsNone(image_size(self.write("a.png", b"not an image at all")))
+
+    def test_broken_image_drops_its_variant(self):
+        source = self.write("a.gif", b"GIF89a" + struct.pack("<HH", 1000, 800))
+        dest = os.path.join(self.dir.name, "public", "a.gif")
+        with unittest.mock.patch("src.images.Image") as image:
+            image.open.side_effect = OSError("truncated")
+            index = ImageIndex(os.path.join(self.dir.name, "images.json"), widths=(480,))
+            index.add(source, dest)
+            self.assertEqual(index.write_variants(), (0, 1))
+        self.assertEqual(index.outputs[os.path.normpath(dest)], [1000, 800, []])
+        self.assertEqual(os.listdir(os.path.dirname(dest)), [])
+
+    def test_index_caches_sizes(self):
+        header = b"GIF89a" + struct.pack("<HH", 40, 30)
+        source = self.write("a.gif", header)
+        cache = os.path.join(self.dir.name, "images.json")
+        index = ImageIndex(cache)
+        index.add(source, os.path.join("public", "a.gif"))
+        index.save()
+        self.assertDictEqual(ImageIndex(cache).previous["outputs"], {os.path.join("public", "a.gif"): [40, 30, []]})
+
+    def test_add_image_attributes(self):
+        images = {os.path.join("public", "images", "map.png"): [1344, 896, [480]]}
+        content = '<p><img src="/images/map.png" alt="map"></img><img src="https://a.b/c.png" alt=""></img></p>'
+        self.assertEqual(add_image_attributes(content, os.path.join("public", "index.html"), images),
+                         '<p><img src="/images/map.png" width="1344" height="896" loading="lazy" '
+                         'srcset="/images/map-480w.png 480w, /images/map.png 1344w" '
+                         'sizes="(max-width: 1344px) 100vw, 1344px" alt="map"></img>'
+                         '<img src="https://a.b/c.png" loading="lazy" alt=""></img></p>')
+
+    def test_variant_path(self):
+        self.assertEqual(variant_path("/images/map.png", 480), "/images/map-480w.png")
+
+
+if __name__ == "__main__":
+    unittest.main()
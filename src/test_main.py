@@ -0,0 +1,178 @@
+import contextlib
+import io
+import json
+import os
+import struct
+import unittest
+
+from src.main import build, collect_pages, generate_all, generate_page, page_output, rebuild_changed
+from src.test_support import TempDirTestCase
+from cache import ContentCache
+from check import ReferenceIndex
+from images import ImageIndex
+
+
+class TestBuild(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.content = os.path.join(self.dir.name, "content")
+        self.public = os.path.join(self.dir.name, "public")
+        self.template = os.path.join(self.dir.name, "template.html")
+        os.makedirs(os.path.join(self.content, "post"))
+        self.write(self.template, "<title>{{ Title }}</title>{{ Content }}")
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\nhello")
+        self.write(os.path.join(self.content, "post", "index.md"), "# Post\n\n**bold**")
+        self.write(os.path.join(self.content, "notes.txt"), "ignored")
+
+    def jobs(self):
+        return [(source, self.template, dest) for source, dest in collect_pages(self.content, self.public)]
+
+    def test_collect_pages(self):
+        self.assertListEqual(collect_pages(self.content, self.public), [
+            (os.path.join(self.content, "index.md"), os.path.join(self.public, "index.html")),
+            (os.path.join(self.content, "post", "index.md"), os.path.join(self.public, "post", "index.html")),
+        ])
+
+    def test_page_output_keeps_directory_names(self):
+        self.assertEqual(page_output(os.path.join("notes.md.d", "x.md"), "public"),
+                         os.path.join("public", "notes.md.d", "x.html"))
+
+    def test_generate_all(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            failures = generate_all(self.jobs(), workers=2)
+        self.assertListEqual(failures, [])
+        self.assertEqual(self.read(os.path.join(self.public, "post", "index.html")),
+                         "<title>Post</title><div><h1>Post</h1><p><b>bold</b></p></div>")
+
+    def test_generate_all_reports_failures(self):
+        self.write(os.path.join(self.content, "index.md"), "no title")
+        log = io.StringIO()
+        with contextlib.redirect_stdout(log):
+            failures = generate_all(self.jobs(), workers=2)
+        self.assertListEqual([job[0] for job in failures], [os.path.join(self.content, "index.md")])
+        self.assertIn("No title found", log.getvalue())
+        self.assertFalse(os.path.exists(os.path.join(self.public, "index.html")))
+        self.assertTrue(os.path.exists(os.path.join(self.public, "post", "index.html")))
+
+    def test_generate_page_rerenders_truncated_cache_entry(self):
+        cache = ContentCache(os.path.join(self.dir.name, "cache"))
+        source = os.path.join(self.content, "index.md")
+        self.write(source, "# Home\n\n" + "\n\n".join(os.urandom(64).hex() for _ in range(2000)))
+        dest = os.path.join(self.public, "index.html")
+        generate_page(source, self.template, dest, cache)
+        expected = self.read(dest)
+        path = cache.path(cache.key(source))
+        with open(path, "rb") as f:
+            data = f.read()
+        with open(path, "wb") as f:
+            f.write(data[:len(data) // 2])
+        os.remove(dest)
+        generate_page(source, self.template, dest, cache)
+        self.assertEqual(self.read(dest), expected)
+        self.assertEqual(cache.get(cache.key(source))[0], expected[len("<title>Home</title>"):])
+        self.assertListEqual(os.listdir(self.public), ["index.html"])
+
+
+class TestIncrementalBuild(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        for directory in ("content/post", "static"):
+            os.makedirs(os.path.join(self.dir.name, directory))
+        self.write("template.html", "<title>{{ Title }}</title>{{ Content }}")
+        self.write("content/index.md", "# Home\n\nhello")
+        self.write("content/post/index.md", "# Post\n\n**bold**")
+        self.write("static/index.css", "body {}")
+
+    def path(self, path):
+        return os.path.join(self.dir.name, path)
+
+    def build(self):
+        return self.generated(build, incremental=True)
+
+    def rebuild(self, paths):
+        return self.generated(rebuild_changed, [self.path(path) for path in paths])
+
+    def generated(self, run, *args, **kwargs):
+        # runs build over the temp site with fresh indexes and returns the pages it generated
+        log = io.StringIO()
+        with contextlib.redirect_stdout(log):
+            failures = run(*args, references=ReferenceIndex(self.path("references.json")),
+                           images=ImageIndex(self.path("images.json")), manifest_path=self.path("manifest.json"),
+                           template_path=self.path("template.html"), content=self.path("content"),
+                           static=self.path("static"), public=self.path("public"), **kwargs)
+        self.assertListEqual(failures, [])
+        return [line.split()[3] for line in log.getvalue().splitlines() if line.startswith("Generating page from")]
+
+    def change(self, path, data):
+        # a later mtime than the first build saw, however coarse the file system's clock
+        path = self.write(path, data)
+        mtime = os.stat(path).st_mtime_ns + 10**9
+        os.utime(path, ns=(mtime, mtime))
+
+    def test_only_changed_pages_regenerate(self):
+        self.assertEqual(len(self.build()), 2)
+        self.assertListEqual(self.build(), [])
+        self.change("content/post/index.md", "# Post\n\n*changed*")
+        self.assertListEqual(self.build(), [self.path("content/post/index.md")])
+        self.assertEqual(self.read("public/post/index.html"),
+                         "<title>Post</title><div><h1>Post</h1><p><i>changed</i></p></div>")
+        self.assertEqual(self.read("public/index.css"), "body {}")
+
+    def test_outputs_of_deleted_sources_are_removed(self):
+        self.build()
+        os.remove(self.path("content/post/index.md"))
+        os.remove(self.path("static/index.css"))
+        self.assertListEqual(self.build(), [])
+        self.assertFalse(os.path.exists(self.path("public/post")))
+        self.assertFalse(os.path.exists(self.path("public/index.css")))
+        self.assertTrue(os.path.exists(self.path("public/index.html")))
+
+    def test_template_change_invalidates_its_pages(self):
+        self.build()
+        self.write("content/post/template.html", "<h1>{{ Title }}</h1>{{ Content }}")
+        self.assertListEqual(self.build(), [self.path("content/post/index.md")])
+        self.assertTrue(self.read("public/post/index.html").startswith("<h1>Post</h1>"))
+        self.change("template.html", "<html>{{ Content }}</html>")
+        self.assertListEqual(self.build(), [self.path("content/index.md")])
+        self.assertTrue(self.read("public/index.html").startswith("<html><div>"))
+
+    def test_rebuild_regenerates_changed_page(self):
+        self.build()
+        self.change("content/index.md", "# Home\n\nchanged")
+        self.assertListEqual(self.rebuild(["content/index.md"]), [self.path("content/index.md")])
+        self.assertEqual(self.read("public/index.html"), "<title>Home</title><div><h1>Home</h1><p>changed</p></div>")
+        self.assertListEqual(self.build(), [])
+
+    def test_rebuild_regenerates_pages_showing_a_changed_image(self):
+        self.write("static/a.gif", b"GIF89a" + struct.pack("<HH", 40, 30))
+        self.write("static/b.gif", b"GIF89a" + struct.pack("<HH", 20, 10))
+        self.write("content/post/index.md", "# Post\n\n![a](../a.gif)")
+        self.build()
+        self.assertIn('width="40" height="30"', self.read("public/post/index.html"))
+        self.change("static/a.gif", b"GIF89a" + struct.pack("<HH", 80, 60))
+        self.assertListEqual(self.rebuild(["static/a.gif"]), [self.path("content/post/index.md")])
+        self.assertIn('width="80" height="60"', self.read("public/post/index.html"))
+        outputs = json.loads(self.read("images.json"))["outputs"]
+        self.assertEqual(outputs[self.path("public/a.gif")], [80, 60, []])
+        self.assertEqual(outputs[self.path("public/b.gif")], [20, 10, []])
+        self.assertListEqual(self.build(), [])
+
+    def test_rebuild_regenerates_pages_below_a_new_template(self):
+        self.build()
+        self.write("content/post/template.html", "<h1>{{ Title }}</h1>{{ Content }}")
+        self.assertListEqual(self.rebuild(["content/post/template.html"]), [self.path("content/post/index.md")])
+        self.assertTrue(self.read("public/post/index.html").startswith("<h1>Post</h1>"))
+        self.assertListEqual(self.build(), [])
+
+    def test_rebuild_removes_outputs_of_deleted_sources(self):
+        self.build()
+        os.remove(self.path("content/post/index.md"))
+        os.remove(self.path("static/index.css"))
+        self.assertListEqual(self.rebuild(["content/post/index.md", "static/index.css"]), [])
+        self.assertFalse(os.path.exists(self.path("public/post")))
+        self.assertFalse(os.path.exists(self.path("public/index.css")))
+        self.assertListEqual(self.build(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
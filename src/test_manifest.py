@@ -0,0 +1,54 @@
+import os
+import unittest
+
+from src.manifest import Manifest, fingerprint, load_manifest, save_manifest
+from src.test_support import TempDirTestCase
+
+
+class TestManifest(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.source = self.write("page.md", "# Title")
+
+    def test_fingerprint_reuses_previous_when_stat_matches(self):
+        previous = dict(fingerprint(self.source), hash="cached")
+        self.assertEqual(fingerprint(self.source, previous)["hash"], "cached")
+
+    def test_track_new_source_is_changed(self):
+        manifest = Manifest()
+        self.assertTrue(manifest.track(self.source, "page.html"))
+
+    def test_track_unchanged_source(self):
+        previous = Manifest()
+        previous.track(self.source, "page.html")
+        manifest = Manifest(previous.to_dict())
+        self.assertFalse(manifest.track(self.source, "page.html"))
+        self.assertFalse(manifest.is_stale())
+
+    def test_removed_outputs(self):
+        previous = Manifest()
+        previous.track(self.source, "page.html")
+        manifest = Manifest(previous.to_dict())
+        self.assertListEqual(manifest.removed_outputs(), ["page.html"])
+
+    def test_keep_carries_previous_entries(self):
+        previous = Manifest()
+        previous.track(self.source, "page.html")
+        previous.track_template(self.source, "template.html")
+        previous.depend("page.html", [self.source, "template.html"])
+        manifest = Manifest(previous.to_dict())
+        manifest.keep(self.source)
+        self.assertListEqual(manifest.removed_outputs(), [])
+        self.assertDictEqual(manifest.to_dict()["dependencies"], {"page.html": sorted([self.source, "template.html"])})
+
+    def test_save_and_load(self):
+        path = os.path.join(self.dir.name, "cache", "manifest.json")
+        manifest = Manifest()
+        manifest.track(self.source, "page.html")
+        save_manifest(manifest.to_dict(), path)
+        self.assertDictEqual(load_manifest(path), manifest.to_dict())
+        self.assertDictEqual(load_manifest(os.path.join(self.dir.name, "missing.json")), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
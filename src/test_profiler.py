@@ -0,0 +1,61 @@
+import os
+import time
+import unittest
+
+from src.main import profile_page
+from src.profiler import PAGE_STAGES, PageProfile, Profiler
+from src.test_support import TempDirTestCase
+from cache import ContentCache
+
+
+class TestProfiler(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.source = self.write("index.md", "# Home\n\nsome **bold** text\n\n* one\n* two")
+        self.template = self.write("template.html", "<title>{{ Title }}</title>{{ Content }}")
+        self.dest = os.path.join(self.dir.name, "public", "index.html")
+
+    def test_profile_page(self):
+        profile = profile_page(self.source, self.template, self.dest, index=True)
+        html = self.read(self.dest)
+        self.assertEqual(html, "<title>Home</title><div><h1>Home</h1><p>some <b>bold</b> text</p>"
+                               "<ul><li>one</li><li>two</li></ul></div>")
+        self.assertEqual(profile.result[:2], (True, "Home"))
+        self.assertIn("bold", profile.result[2])
+        self.assertEqual(profile.bytes_out, len(html))
+        self.assertEqual(profile.stages["markdown"][2], 1)
+        self.assertGreater(profile.stages["index"][2], 1)
+        self.assertGreaterEqual(profile.wall, sum(profile.stages[stage][0] for stage in PAGE_STAGES))
+
+    def test_profile_page_counts_cache_hits(self):
+        cache = ContentCache(os.path.join(self.dir.name, "cache"))
+        self.assertFalse(profile_page(self.source, self.template, self.dest, cache=cache).cached)
+        profile = profile_page(self.source, self.template, self.dest, cache=cache)
+        self.assertTrue(profile.cached)
+        self.assertEqual(profile.stages["markdown"][2], 0)
+
+    def test_nested_stages_are_charged_exclusively(self):
+        profile = PageProfile("index.md")
+        with profile.stage("markdown"):
+            with profile.stage("write"):
+                time.sleep(0.02)
+        self.assertGreaterEqual(profile.stages["write"][0], 0.02)
+        self.assertLess(profile.stages["markdown"][0], 0.02)
+
+    def test_trace_events(self):
+        profiler = Profiler()
+        with profiler.span("pages"):
+            profiler.pages.append(profile_page(self.source, self.template, self.dest))
+        events = profiler.trace_events()
+        self.assertEqual(len(events), 2 + len(PAGE_STAGES))
+        self.assertListEqual([event["cat"] for event in events[:2]], ["build", "page"])
+
+    def test_disabled_profiler_records_nothing(self):
+        profiler = Profiler(enabled=False)
+        with profiler.span("pages"):
+            pass
+        self.assertListEqual(profiler.spans, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
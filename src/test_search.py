@@ -0,0 +1,61 @@
+import json
+import os
+import unittest
+
+from src.search import SearchIndex, add_terms, page_terms, page_url, shard_name
+from src.test_support import TempDirTestCase
+
+
+class TestSearch(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cache = os.path.join(self.dir.name, "cache")
+        self.output = os.path.join(self.dir.name, "public", "search")
+
+    def shard(self, name):
+        return json.loads(self.read(os.path.join(self.output, f"{name}.json")))
+
+    def test_page_terms(self):
+        terms = page_terms("<div><h1>Hobbit holes</h1><p>a <b>hobbit</b> &amp; friends</p></div>")
+        self.assertDictEqual(terms, {"hobbit": [0, 3], "holes": [1], "friends": [4]})
+
+    def test_add_terms_in_chunks(self):
+        terms = {}
+        position = add_terms(terms, "<div><h1>Hobbit holes</h1>")
+        position = add_terms(terms, "<p></p>", position)
+        add_terms(terms, "<p>a <b>hobbit</b> &amp; friends</p></div>", position)
+        self.assertDictEqual(terms, page_terms("<div><h1>Hobbit holes</h1><p>a <b>hobbit</b> &amp; friends</p></div>"))
+
+    def test_shard_name_and_url(self):
+        self.assertEqual(shard_name("élan"), "_l")
+        self.assertEqual(page_url(os.path.join("public", "blog", "index.html")), "/blog/")
+        self.assertEqual(page_url(os.path.join("public", "index.html")), "/")
+
+    def test_update_and_prune(self):
+        index = SearchIndex(self.cache, self.output)
+        index.update("content/a.md", "/a.html", "A", {"ring": [0], "river": [1]})
+        index.update("content/b.md", "/b.html", "B", {"ring": [4]})
+        self.assertEqual(index.save(), 1)
+        self.assertDictEqual(self.shard("ri"), {"ring": [[0, [0]], [1, [4]]], "river": [[0, [1]]]})
+
+        index = SearchIndex(self.cache, self.output)
+        self.assertIn("content/a.md", index)
+        index.update("content/b.md", "/b.html", "B", {"tower": [0]})
+        index.prune({"content/b.md"})
+        self.assertEqual(index.save(), 2)
+        self.assertFalse(os.path.exists(os.path.join(self.output, "ri.json")))
+        self.assertDictEqual(self.shard("to"), {"tower": [[1, [0]]]})
+        self.assertDictEqual(self.shard("pages"), {"prefix": 2, "pages": {"1": ["/b.html", "B"]}})
+        self.assertEqual(index.outputs(), [os.path.join(self.output, "pages.json"), os.path.join(self.output, "to.json")])
+
+    def test_restores_missing_public_shards(self):
+        index = SearchIndex(self.cache, self.output)
+        index.update("content/a.md", "/a.html", "A", {"ring": [0]})
+        index.save()
+        os.remove(os.path.join(self.output, "ri.json"))
+        SearchIndex(self.cache, self.output).save()
+        self.assertDictEqual(self.shard("ri"), {"ring": [[0, [0]]]})
+
+
+if __name__ == "__main__":
+    unittest.main()
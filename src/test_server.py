@@ -0,0 +1,155 @@
+import http.client
+import os
+import threading
+import unittest
+import unittest.mock
+from functools import partial
+from http.server import ThreadingHTTPServer
+
+from src.server import ReloadNotifier, RenderCache, RenderHandler, changed_paths, snapshot
+from src.test_support import TempDirTestCase
+
+
+class TestWatch(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        os.makedirs(os.path.join(self.dir.name, "content"))
+        self.page = self.write("content/index.md", "# Home")
+
+    def test_snapshot(self):
+        self.assertListEqual(list(snapshot([os.path.join(self.dir.name, "content")])), [self.page])
+
+    def test_snapshot_skips_ignored_files(self):
+        for name in (".index.md.swp", "index.md~"):
+            self.write(f"content/{name}", "")
+        self.assertListEqual(list(snapshot([os.path.join(self.dir.name, "content")])), [self.page])
+
+    def test_changed_paths(self):
+        before = snapshot([self.dir.name])
+        with open(self.page, "a") as f:
+            f.write("\n\nmore")
+        added = self.write("content/new.md", "# New")
+        self.assertListEqual(changed_paths(before, snapshot([self.dir.name])), sorted([self.page, added]))
+
+    def test_snapshot_lists_only_directories_that_changed(self):
+        content = os.path.join(self.dir.name, "content")
+        os.utime(content, ns=(0, 0))
+        listings = {}
+        before = snapshot([content], listings)
+        with open(self.page, "a") as f:
+            f.write("\n\nmore")
+        with unittest.mock.patch("src.server.os.scandir", wraps=os.scandir) as scandir:
+            current = snapshot([content], listings)
+            self.assertEqual(scandir.call_count, 0)
+            self.assertListEqual(changed_paths(before, current), [self.page])
+            added = self.write("content/new.md", "# New")
+            self.assertListEqual(changed_paths(current, snapshot([content], listings)), [added])
+            self.assertEqual(scandir.call_count, 1)
+
+    def test_changed_paths_none(self):
+        self.assertListEqual(changed_paths(snapshot([self.dir.name]), snapshot([self.dir.name])), [])
+
+
+class TestReloadNotifier(unittest.TestCase):
+    def test_wait_times_out(self):
+        notifier = ReloadNotifier()
+        self.assertEqual(notifier.wait(0, timeout=0.01), 0)
+
+    def test_wait_after_notify(self):
+        notifier = ReloadNotifier()
+        notifier.notify()
+        self.assertEqual(notifier.wait(0, timeout=0.01), 1)
+
+
+class TestRenderCache(TempDirTestCase):
+    def test_evicts_least_recently_used(self):
+        cache = RenderCache(capacity=2)
+        cache.put("a", b"1")
+        cache.put("b", b"2")
+        cache.get("a")
+        cache.put("c", b"3")
+        self.assertEqual(cache.get("a"), b"1")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), b"3")
+
+    def test_fingerprint_follows_content(self):
+        path = self.write("index.md", "# One")
+        cache = RenderCache()
+        first = cache.fingerprint(path)
+        self.assertEqual(cache.fingerprint(path), first)
+        self.write("index.md", "# Two!")
+        self.assertNotEqual(cache.fingerprint(path), first)
+
+
+class QuietRenderHandler(RenderHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class TestRenderHandler(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.content = os.path.join(self.dir.name, "content")
+        self.static = os.path.join(self.dir.name, "static")
+        os.makedirs(os.path.join(self.content, "post"))
+        os.makedirs(self.static)
+        self.write("template.html", "<title>{{ Title }}</title>{{ Content }}")
+        self.write("content/index.md", "# Home\n\n![map](/images/map.png)")
+        self.write("content/post/index.md", "# Post")
+        self.write("content/notes.md", "# Notes")
+        self.write("secret.md", "# Secret")
+        self.write("static/index.css", "body {}")
+        images = {os.path.join("public", "images", "map.png"): [40, 30, []]}
+        handler = partial(QuietRenderHandler, directory=self.static, content=self.content, cache=RenderCache(),
+                          template_path=os.path.join(self.dir.name, "template.html"), images=images)
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, args=(0.01,), daemon=True).start()
+        self.connection = http.client.HTTPConnection(*self.server.server_address, timeout=5)
+
+    def tearDown(self):
+        self.connection.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def get(self, path, headers=None):
+        self.connection.request("GET", path, headers=headers or {})
+        response = self.connection.getresponse()
+        return response, response.read().decode()
+
+    def test_source_for_maps_urls_to_markdown(self):
+        for path, title in [("/", "Home"), ("/index.html", "Home"), ("/post/", "Post"), ("/post", "Post"),
+                            ("/post/index.html", "Post"), ("/notes", "Notes"), ("/notes.html", "Notes")]:
+            response, body = self.get(path)
+            self.assertEqual(response.status, 200, path)
+            self.assertTrue(body.startswith(f"<title>{title}</title>"), path)
+        self.assertEqual(self.get("/index.css")[1], "body {}")
+        self.assertEqual(self.get("/missing")[0].status, 404)
+        self.assertEqual(self.get("/../secret")[0].status, 404)
+
+    def test_renders_image_attributes(self):
+        body = self.get("/")[1]
+        self.assertIn('<img src="/images/map.png" width="40" height="30" loading="lazy" alt="map">', body)
+
+    def test_etag_round_trip(self):
+        response, body = self.get("/post/")
+        etag = response.getheader("ETag")
+        response, body = self.get("/post/", {"If-None-Match": etag})
+        self.assertEqual(response.status, 304)
+        self.assertEqual(body, "")
+        self.write("content/post/index.md", "# Post, edited")
+        response, body = self.get("/post/", {"If-None-Match": etag})
+        self.assertEqual(response.status, 200)
+        self.assertNotEqual(response.getheader("ETag"), etag)
+        self.assertTrue(body.startswith("<title>Post, edited</title>"))
+
+    def test_keep_alive(self):
+        self.get("/")
+        sock = self.connection.sock
+        response, _ = self.get("/post/")
+        self.assertFalse(response.will_close)
+        self.assertIs(self.connection.sock, sock)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,21 @@
+import os
+import tempfile
+import unittest
+
+
+class TempDirTestCase(unittest.TestCase):
+    # a fresh directory per test; relative paths given to write and read are taken below it
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+
+    def write(self, path, data):
+        path = os.path.join(self.dir.name, path)
+        with open(path, "wb" if isinstance(data, bytes) else "w") as f:
+            f.write(data)
+        return path
+
+    def read(self, path):
+        with open(os.path.join(self.dir.name, path), "r") as f:
+            return f.read()
@@ -0,0 +1,59 @@
+import io
+import os
+import unittest
+
+from src.template import Template, clear_template_cache, find_template, load_template
+from src.test_support import TempDirTestCase
+
+
+class TestTemplate(unittest.TestCase):
+    def test_segments(self):
+        template = Template("<title>{{ Title }}</title>{{Content}}")
+        self.assertListEqual(template.segments, [("<title>", None), ("{{ Title }}", "Title"), ("</title>", None),
+                                                 ("{{Content}}", "Content")])
+        self.assertListEqual(template.placeholders(), ["Title", "Content"])
+
+    def test_render(self):
+        template = Template("<h1>{{ Title }}</h1>{{ Content }}{{ Unknown }}")
+        sink = io.StringIO()
+        template.render(sink, {"Title": "hi", "Content": lambda out: out.write("<p>body</p>")})
+        self.assertEqual(sink.getvalue(), "<h1>hi</h1><p>body</p>{{ Unknown }}")
+
+    def test_render_to_string(self):
+        self.assertEqual(Template("a {{ Title }} b").render_to_string({"Title": "x"}), "a x b")
+
+
+class TestTemplateFiles(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        clear_template_cache()
+        self.content = os.path.join(self.dir.name, "content")
+        self.default = os.path.join(self.dir.name, "template.html")
+        os.makedirs(os.path.join(self.content, "blog", "2024"))
+        self.write(self.default, "default {{ Content }}")
+
+    def tearDown(self):
+        clear_template_cache()
+
+    def test_load_template_cached(self):
+        template = load_template(self.default)
+        self.assertIs(load_template(self.default), template)
+        self.write(self.default, "changed {{ Content }}")
+        os.utime(self.default, ns=(0, 0))
+        self.assertEqual(load_template(self.default).render_to_string({"Content": ""}), "changed ")
+
+    def test_find_template_default(self):
+        page = os.path.join(self.content, "blog", "2024", "post.md")
+        self.assertEqual(find_template(page, self.content, self.default), self.default)
+
+    def test_find_template_override(self):
+        override = os.path.join(self.content, "blog", "template.html")
+        self.write(override, "blog {{ Content }}")
+        page = os.path.join(self.content, "blog", "2024", "post.md")
+        self.assertEqual(find_template(page, self.content, self.default), override)
+        self.assertEqual(find_template(os.path.join(self.content, "index.md"), self.content, self.default),
+                         self.default)
+
+
+if __name__ == "__main__":
+    unittest.main()
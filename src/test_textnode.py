@@ -1,9 +1,12 @@
+import io
 import textwrap
 import unittest
 
 from src.htmlnode import LeafNode, ParentNode
 from src.textnode import split_nodes_delimiter, extract_markdown_images, extract_markdown_links, split_nodes_image, \
-    split_nodes_link, text_to_textnodes, markdown_to_blocks, block_to_block_type, markdown_to_html_node, extract_title
+    split_nodes_link, text_to_textnodes, markdown_to_blocks, block_to_block_type, markdown_to_html_node, extract_title, \
+    iter_markdown_blocks, write_markdown_html, block_to_html, block_cache_stats, share_block_cache, \
+    classify_block, iter_numbered_blocks, block_references, memo_block_references
 from textnode import TextNode, TextType, text_node_to_html_node
 
 
@@ -66,6 +69,13 @@ class TestTextNode(unittest.TestCase):
                          ParentNode(tag="img", props={"src": "https://www.google.com", "alt": "This is a text node"},
                                     children=[]))
 
+    def test_equal_props_are_shared(self):
+        first = text_node_to_html_node(TextNode("home", TextType.LINK, "/"))
+        second = text_node_to_html_node(TextNode("back", TextType.LINK, "/"))
+        self.assertIs(first.props, second.props)
+        with self.assertRaises(TypeError):
+            first.props["href"] = "/other"
+
     def test_split_nothing(self):
         nodes = [TextNode("This is a text node", TextType.TEXT)]
         self.assertListEqual(split_nodes_delimiter(nodes, "**", TextType.BOLD), nodes)
@@ -161,6 +171,20 @@ class TestTextNode(unittest.TestCase):
             "This is **text** with an *italic* word and a `code block` and an ![obi wan image](https://i.imgur.com/fJRm4Vk.jpeg) and a [link](https://boot.dev)"),
                              expected)
 
+    def test_text_to_textnodes_unbalanced(self):
+        self.assertRaises(ValueError, lambda: text_to_textnodes("This is **not closed"))
+        self.assertRaises(ValueError, lambda: text_to_textnodes("This is `not closed"))
+
+    def test_text_to_textnodes_markup_inside_code(self):
+        self.assertListEqual(text_to_textnodes("run `a * b` now"),
+                             [TextNode("run ", TextType.TEXT), TextNode("a * b", TextType.CODE),
+                              TextNode(" now", TextType.TEXT)])
+
+    def test_text_to_textnodes_multiline(self):
+        self.assertListEqual(text_to_textnodes("**bold\ntext** [a](b)"),
+                             [TextNode("bold\ntext", TextType.BOLD), TextNode(" ", TextType.TEXT),
+                              TextNode("a", TextType.LINK, "b")])
+
     def test_markdown_to_blocks(self):
         input = textwrap.dedent("""
         # This is a heading
@@ -174,6 +198,68 @@ class TestTextNode(unittest.TestCase):
         expected = ["# This is a heading","This is a paragraph of text. It has some **bold** and *italic* words inside of it.","* This is the first list item in a list block\n* This is a list item\n* This is another list item"]
         self.assertListEqual(markdown_to_blocks(input),expected)
 
+    def test_iter_markdown_blocks_lines(self):
+        lines = iter(["# heading\n", "\n", "\n", "first line\n", "second line\n", "   \n", "* item"])
+        self.assertListEqual(list(iter_markdown_blocks(lines)), ["# heading", "first line\nsecond line", "* item"])
+
+    def test_unclosed_fence_keeps_blocks(self):
+        lines = io.StringIO("# title\n\n```\nnever closed\n\nparagraph\n\n* item\n")
+        self.assertListEqual(list(iter_numbered_blocks(lines)),
+                             [(1, "# title"), (3, "```\nnever closed"), (6, "paragraph"), (8, "* item")])
+
+    def test_large_closed_fence_stays_one_block(self):
+        code = "```\n" + "x = 1\n\n" * 200000 + "```"
+        sink = io.StringIO()
+        write_markdown_html(io.StringIO("# title\n\n" + code + "\n\nafter\n"), sink)
+        html = sink.getvalue()
+        self.assertGreater(len(html), 1 << 20)
+        self.assertEqual(html.count("<pre><code>"), 1)
+        self.assertTrue(html.endswith("</code></pre><p>after</p></div>"))
+
+    def test_write_markdown_html(self):
+        markdown = "# heading\n\nsome **bold** text\n\n1. one\n2. two\n"
+        sink = io.StringIO()
+        write_markdown_html(io.StringIO(markdown), sink)
+        self.assertEqual(sink.getvalue(), markdown_to_html_node(markdown).to_html())
+
+    def test_write_markdown_html_collects_references(self):
+        markdown = "# [home](/)\n\nsee `[code](/x)` and\n![map](map.png) or [next](next.md)\n"
+        references = []
+        write_markdown_html(io.StringIO(markdown), [], references)
+        self.assertListEqual(references, [(1, "link", "/"), (4, "image", "map.png"), (4, "link", "next.md")])
+
+    def test_long_block_references_not_memoized(self):
+        block = "[a](/a) " * 4000
+        before = memo_block_references.cache_info().currsize
+        self.assertEqual(len(block_references(block)), 4000)
+        self.assertEqual(memo_block_references.cache_info().currsize, before)
+
+    def test_block_to_html_memoized(self):
+        block = "* a memoized **list**\n* of items"
+        before = block_cache_stats()
+        first = block_to_html(block)
+        self.assertIs(block_to_html(block), first)
+        after = block_cache_stats()
+        after.subtract(before)
+        self.assertEqual(after["block_hits"], 1)
+        self.assertEqual(after["block_misses"], 1)
+        self.assertEqual(first, markdown_to_html_node(block).to_html()[len("<div>"):-len("</div>")])
+
+    def test_block_to_html_shared(self):
+        shared = {"shared block from another worker": "<p>from another worker</p>"}
+        share_block_cache(shared)
+        try:
+            self.assertEqual(block_to_html("shared block from another worker"), "<p>from another worker</p>")
+            block_to_html("a block first seen here")
+            self.assertEqual(shared["a block first seen here"], "<p>a block first seen here</p>")
+            share_block_cache(shared, limit=1)
+            block_to_html("stored in the shared cache")
+            block_to_html("kept local once the limit is used up")
+            self.assertIn("stored in the shared cache", shared)
+            self.assertNotIn("kept local once the limit is used up", shared)
+        finally:
+            share_block_cache(None)
+
     def test_block_to_block_type_heading(self):
         self.assertEqual(block_to_block_type("# This is a heading"), "heading")
     def test_block_to_block_type_code(self):
@@ -191,6 +277,23 @@ class TestTextNode(unittest.TestCase):
         self.assertEqual(block_to_block_type("1. This is a ordered_list\n2. This is a ordered_list"), "ordered_list")
         self.assertNotEqual(block_to_block_type("1. This is not a ordered_list\n3. This is not a ordered_list"), "ordered_list")
         self.assertNotEqual(block_to_block_type("2. This is not a ordered_list\n3. This is not a ordered_list"), "ordered_list")
+    def test_classify_block_items(self):
+        self.assertEqual(classify_block("## small"), ("heading", ["small"]))
+        self.assertEqual(classify_block("> one\n> two"), ("quote", ["one", "two"]))
+        self.assertEqual(classify_block("- one\n* two"), ("unordered_list", ["one", "two"]))
+        self.assertEqual(classify_block("1. one\n2. two"), ("ordered_list", ["one", "two"]))
+        self.assertEqual(classify_block("1. one\n- two"), ("paragraph", ["1. one\n- two"]))
+        self.assertEqual(classify_block("####### seven"), ("paragraph", ["####### seven"]))
+    def test_classify_block_long_list(self):
+        block = "\n".join(f"{i}. item {i}" for i in range(1, 5001))
+        block_type, items = classify_block(block)
+        self.assertEqual(block_type, "ordered_list")
+        self.assertEqual(items[-1], "item 5000")
+    def test_markdown_to_blocks_code_with_blank_lines(self):
+        markdown = "# title\n\n```\nfirst\n\nsecond\n```\n\nafter ```inline``` code\n\nlast"
+        self.assertListEqual(markdown_to_blocks(markdown),
+                             ["# title", "```\nfirst\n\nsecond\n```", "after ```inline``` code", "last"])
+        self.assertEqual(block_to_block_type(markdown_to_blocks(markdown)[1]), "code")
     def test_block_to_block_type_paragraph(self):
         self.assertEqual(block_to_block_type("This is a paragraph"), "paragraph")
 
@@ -226,6 +329,7 @@ class TestTextNode(unittest.TestCase):
         self.assertEqual(extract_title("# This is a heading \nsdasda\nfsdfd"),"This is a heading")
         self.assertEqual(extract_title("asda\n# This is a heading \nsdasda\nfsdfd"),"This is a heading")
         self.assertRaises(ValueError,lambda:extract_title("asda\nThis is a heading \nsdasda\nfsdfd\n\n"))
+        self.assertEqual(extract_title(io.StringIO("asda\n# This is a heading \nsdasda")),"This is a heading")
 
 
 if __name__ == "__main__":
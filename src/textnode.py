@@ -1,7 +1,10 @@
+from collections import Counter
 from enum import Enum
+from functools import lru_cache
+from types import MappingProxyType
 from typing import Any
 import re
-from htmlnode import LeafNode, ParentNode
+from htmlnode import NO_CHILDREN, LeafNode, ParentNode
 
 class TextType(Enum):
     NORMAL = "normal"
@@ -19,6 +22,7 @@ class TextType(Enum):
         return self.value == other.value
 
 class TextNode:
+    __slots__ = ("text", "text_type", "url")
 
     def __init__(self, text:str, text_type:TextType, url:str = None):
         self.text = text
@@ -42,12 +46,22 @@ def text_node_to_html_node(text_node):
         case TextType.CODE:
             return LeafNode(tag="code", value=text_node.text)
         case TextType.LINK:
-            return LeafNode(tag="a", props={"href": text_node.url}, value=text_node.text)
+            return LeafNode(tag="a", props=link_props(text_node.url), value=text_node.text)
         case TextType.IMAGE:
-            return ParentNode(tag="img", props={"src": text_node.url, "alt": text_node.text}, children=[])
+            return ParentNode(tag="img", props=image_props(text_node.url, text_node.text), children=NO_CHILDREN)
         case _:
             raise ValueError("Invalid text type")
 
+# navigation links and repeated images produce the same attributes again and again, so equal props are
+# built once and shared; the mapping is read-only so no node can change another node's attributes
+@lru_cache(maxsize=4096)
+def link_props(url):
+    return MappingProxyType({"href": url})
+
+@lru_cache(maxsize=4096)
+def image_props(url, alt):
+    return MappingProxyType({"src": url, "alt": alt})
+
 def split_nodes_delimiter(old_nodes, delimiter, text_type):
     new_nodes = []
     for node in old_nodes:
@@ -115,75 +129,207 @@ def split_nodes_link(old_nodes):
             new_nodes.append(old_node)
     return new_nodes
 
+INLINE_PATTERN = re.compile(
+    r"\*\*(?P<bold>.*?)\*\*"
+    r"|\*(?P<italic>[^*].*?)\*"
+    r"|`(?P<code>.*?)`"
+    r"|!\[(?P<alt>[^\[\]]*)\]\((?P<src>[^\(\)]*)\)"
+    r"|\[(?P<text>[^\[\]]*)\]\((?P<href>[^\(\)]*)\)",
+    re.S,
+)
+INLINE_DELIMITERS = {"bold": TextType.BOLD, "italic": TextType.ITALIC, "code": TextType.CODE}
+
 def text_to_textnodes(text):
-    nodes = [TextNode(text, TextType.TEXT)]
-    nodes = split_nodes_delimiter(nodes, "**", TextType.BOLD)
-    nodes = split_nodes_delimiter(nodes, "*", TextType.ITALIC)
-    nodes = split_nodes_delimiter(nodes, "`", TextType.CODE)
-    nodes = split_nodes_image(nodes)
-    nodes = split_nodes_link(nodes)
+    # one scan over the text; the earliest match wins, bold before italic at the same position
+    nodes = []
+    position = 0
+    for match in INLINE_PATTERN.finditer(text):
+        if match.start() > position:
+            nodes.append(plain_text_node(text[position:match.start()]))
+        kind = match.lastgroup
+        if kind == "src":
+            nodes.append(TextNode(match["alt"], TextType.IMAGE, match["src"]))
+        elif kind == "href":
+            nodes.append(TextNode(match["text"], TextType.LINK, match["href"]))
+        elif match[kind] != "":
+            nodes.append(TextNode(match[kind], INLINE_DELIMITERS[kind]))
+        position = match.end()
+    if position < len(text):
+        nodes.append(plain_text_node(text[position:]))
     return nodes
 
+def plain_text_node(text):
+    if "*" in text or "`" in text:
+        raise ValueError("Invalid Markdown syntax")
+    return TextNode(text, TextType.TEXT)
+
 
 def markdown_to_blocks(markdown):
-    return list(filter(lambda x: x != "",map(lambda x: x.strip(),markdown.split("\n\n"))))
+    return list(iter_markdown_blocks(markdown.split("\n")))
+
+def iter_markdown_blocks(lines):
+    for _, block in iter_numbered_blocks(lines):
+        yield block
+
+def iter_numbered_blocks(lines):
+    # lines may be a file object, so only the current block is ever held in memory
+    block = []
+    start = 0
+    in_code = False
+    for number, line in enumerate(lines, 1):
+        line = line.rstrip("\n")
+        if line.lstrip().startswith("```") and line.count("```") % 2 == 1:
+            in_code = not in_code
+        if in_code or line.strip() != "":
+            if not block:
+                start = number
+            block.append(line)
+        elif block:
+            yield start, "\n".join(block).strip()
+            block = []
+    if in_code:
+        # no closing fence arrived, so the lines keep their ordinary blank-line blocks
+        yield from split_unfenced(start, block)
+    elif block:
+        yield start, "\n".join(block).strip()
+
+def split_unfenced(start, lines):
+    block = []
+    for number, line in enumerate(lines, start):
+        if line.strip() != "":
+            if not block:
+                start = number
+            block.append(line)
+        elif block:
+            yield start, "\n".join(block).strip()
+            block = []
+    if block:
+        yield start, "\n".join(block).strip()
+
+HEADING_PATTERN = re.compile(r"#{1,6} ")
+ORDERED_ITEM_PATTERN = re.compile(r"(\d+)\. ")
 
 def block_to_block_type(block):
-    if re.match(r"^#{1,6} ",block):
-        return "heading"
+    return classify_block(block)[0]
+
+def classify_block(block):
+    # one pass over the lines decides the block type and strips the markers from its items
+    if HEADING_PATTERN.match(block):
+        level = len(block) - len(block.lstrip("#"))
+        return "heading", [block[level+1:]]
     if block[:3] == "```" and block[-3:] == "```":
-        return "code"
-    if all(re.match(r"^> ", line) for line in block.splitlines()):
-        return "quote"
-    if all(re.match(r"^[-*] ", line) for line in block.splitlines()):
-        return "unordered_list"
-    if do_lines_increment_from_one(block):
-        return "ordered_list"
-    return "paragraph"
-
-def do_lines_increment_from_one(block):
-    lines = block.splitlines()
-    numbers = []  # To store the leading numbers
+        return "code", [block[4:-3]]
+    lines = block.split("\n")
+    quote = unordered = ordered = True
+    items = []
+    for number, line in enumerate(lines, 1):
+        quote = quote and line[:2] == "> "
+        unordered = unordered and line[:2] in ("- ", "* ")
+        if ordered:
+            match = ORDERED_ITEM_PATTERN.match(line)
+            ordered = match is not None and int(match.group(1)) == number
+            if ordered:
+                items.append(line[match.end():])
+        if not (quote or unordered or ordered):
+            return "paragraph", [block]
+    if quote:
+        return "quote", [line[2:] for line in lines]
+    if unordered:
+        return "unordered_list", [line[2:] for line in lines]
+    return "ordered_list", items
 
-    for line in lines:
-        match = re.match(r"^(\d+)\. ", line)
-        if match:
-            numbers.append(int(match.group(1)))
+def markdown_to_html_node(markdown):
+    return ParentNode(tag="div",children=list(map(block_to_html_node, markdown_to_blocks(markdown))))
+
+def write_markdown_html(lines, sink, references=None):
+    # references, when given a list, collects the link and image targets of the same blocks on the way
+    write = sink.append if isinstance(sink, list) else sink.write
+    write("<div>")
+    for start, block in iter_numbered_blocks(lines):
+        if references is not None:
+            references.extend((start + offset, kind, url) for offset, kind, url in block_references(block))
+        if len(block) <= MEMO_BLOCK_LENGTH:
+            write(block_to_html(block))
         else:
-            return False  # Line doesn't match the pattern
+            block_to_html_node(block).write_html(sink)
+    write("</div>")
 
-    # Check if the numbers form a sequence starting from 1
-    return numbers == list(range(1, len(numbers) + 1))
+# blocks such as disclaimers and navigation lists repeat across pages, so their HTML is memoized
+BLOCK_CACHE_SIZE = 8192
+MEMO_BLOCK_LENGTH = 16384
+SHARED_BLOCK_LIMIT = 65536
+_shared_blocks = None
+_shared_hits = 0
+_shared_room = 0
 
-def markdown_to_html_node(markdown):
-    blocks = markdown_to_blocks(markdown)
-    nodes = []
-    for block in blocks:
-        match block_to_block_type(block):
-            case "heading":
-                count = block.count('#',0,7)
-                nodes.append(text_to_html_nodes(block[count+1:],f"h{count}"))
-            case "code":
-                nodes.append(ParentNode(tag="pre", children=[text_to_html_nodes(block[4:-3],"code")]))
-            case "quote":
-                nodes.append(text_to_html_nodes(re.sub(r"^> ","",block,flags=re.M),"blockquote"))
-            case "unordered_list":
-                nodes.append(ParentNode(tag="ul",children=list(map(lambda x: text_to_html_nodes(x[2:],"li"),block.splitlines()))))
-            case "ordered_list":
-                nodes.append(ParentNode(tag="ol",children=list(map(lambda x: text_to_html_nodes(re.sub(r"^\d+\. ","",x),"li"),block.splitlines()))))
-            case "paragraph":
-                nodes.append(text_to_html_nodes(block,"p"))
-            case _:
-                raise ValueError("Invalid block type")
-
-    return ParentNode(tag="div",children=nodes)
+def share_block_cache(mapping, limit=SHARED_BLOCK_LIMIT):
+    # a mapping shared between worker processes, consulted when the local cache misses; each worker
+    # counts its own stores against its part of the limit, as asking the manager for len() is a round trip
+    global _shared_blocks, _shared_room
+    _shared_blocks = mapping
+    _shared_room = limit
+
+@lru_cache(maxsize=BLOCK_CACHE_SIZE)
+def block_to_html(block):
+    global _shared_hits, _shared_room
+    if _shared_blocks is not None:
+        html = _shared_blocks.get(block)
+        if html is not None:
+            _shared_hits += 1
+            return html
+    html = block_to_html_node(block).to_html()
+    if _shared_blocks is not None and _shared_room > 0:
+        _shared_blocks[block] = html
+        _shared_room -= 1
+    return html
+
+def block_cache_stats():
+    info = block_to_html.cache_info()
+    return Counter(block_hits=info.hits + _shared_hits, block_misses=info.misses - _shared_hits)
+
+def block_references(block):
+    # memoized like block_to_html, and likewise only for blocks short enough to be worth keeping alive
+    if len(block) <= MEMO_BLOCK_LENGTH:
+        return memo_block_references(block)
+    return find_block_references(block)
+
+def find_block_references(block):
+    # link and image targets with the line of the block they sit on; the tokenizer's own pattern, so only
+    # targets that render as links or images are reported
+    references = []
+    for match in INLINE_PATTERN.finditer(block):
+        if match.lastgroup in ("src", "href"):
+            kind = "image" if match.lastgroup == "src" else "link"
+            references.append((block.count("\n", 0, match.start()), kind, match[match.lastgroup]))
+    return tuple(references)
+
+memo_block_references = lru_cache(maxsize=BLOCK_CACHE_SIZE)(find_block_references)
+
+def block_to_html_node(block, classified=None):
+    block_type, items = classified or classify_block(block)
+    match block_type:
+        case "heading":
+            return text_to_html_nodes(items[0],f"h{len(block) - len(block.lstrip('#'))}")
+        case "code":
+            return ParentNode(tag="pre", children=[text_to_html_nodes(items[0],"code")])
+        case "quote":
+            return text_to_html_nodes("\n".join(items),"blockquote")
+        case "unordered_list":
+            return ParentNode(tag="ul",children=[text_to_html_nodes(item,"li") for item in items])
+        case "ordered_list":
+            return ParentNode(tag="ol",children=[text_to_html_nodes(item,"li") for item in items])
+        case "paragraph":
+            return text_to_html_nodes(block,"p")
+        case _:
+            raise ValueError("Invalid block type")
 
 
 def text_to_html_nodes(block, tag):
     return ParentNode(tag, list(map(text_node_to_html_node, text_to_textnodes(block))))
 
 def extract_title(markdown):
-    match = re.search(r"^# (.*)",markdown,re.M)
-    if match:
-        return match.group(1).strip()
+    lines = markdown.split("\n") if isinstance(markdown, str) else markdown
+    for line in lines:
+        if line.startswith("# "):
+            return line[2:].strip()
     raise ValueError("No title found")
\ No newline at end of file